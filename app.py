@@ -1,59 +1,252 @@
-from flask import Flask, request, render_template, send_file, flash, redirect, url_for, session
+from flask import Flask, Request, request, render_template, send_file, flash, redirect, url_for, session
 import os
 import tempfile
 import zipfile
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 import io
+import contextlib
+import codecs
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import wraps
 import logging
 import shutil
 import uuid
 import time
+import json
+import threading
+import sqlite3
+import mmap
+import zlib
+import hashlib
+import posixpath
+import socket
+import struct
+import queue
+import sys
 from urllib.parse import urlparse
-from flask_session import Session
+
+# OOXML namespaces used by the streaming DOCX/PPTX engine
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+A_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+P_NS = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+R_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+S_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+# OpenDocument namespaces used by the streaming ODT/ODS/ODP engine
+OFFICE_NS = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}'
+TEXT_NS = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+TABLE_NS = '{urn:oasis:names:tc:opendocument:xmlns:table:1.0}'
+DRAW_NS = '{urn:oasis:names:tc:opendocument:xmlns:drawing:1.0}'
+PRESENTATION_NS = '{urn:oasis:names:tc:opendocument:xmlns:presentation:1.0}'
+
+# Prefix of fragment cache keys; bump it whenever a converter's output changes
+FRAGMENT_CACHE_VERSION = 'v2'
+
+# Chunking of the text decoding engine (MarkItDown._iter_text)
+TEXT_SNIFF_BYTES = 64 * 1024
+TEXT_CHUNK_BYTES = 1024 * 1024
+
+def _latin1_fallback(error):
+    """Decode bytes that are invalid in the sniffed encoding as latin-1 and carry on,
+    so one stray byte does not force a second decoding pass"""
+    return error.object[error.start:error.end].decode('latin-1'), error.end
+
+codecs.register_error('markitdown-latin-1', _latin1_fallback)
 
 # Custom MarkItDown fallback implementation
 class MarkItDownResult:
-    def __init__(self, text_content):
-        self.text_content = text_content
+    """Markdown produced by a conversion. Passthrough results (text files that are
+    already valid UTF-8) keep the original bytes, often an mmap, in data and only
+    decode text_content if it is asked for."""
+    
+    def __init__(self, text_content=None, data=None):
+        self._text_content = text_content
+        self.data = data
+    
+    @property
+    def text_content(self):
+        if self._text_content is None and self.data is not None:
+            self._text_content = str(self.data, 'utf-8')
+        return self._text_content
+    
+    @text_content.setter
+    def text_content(self, value):
+        self._text_content = value
+        self.data = None
+    
+    def encoded(self):
+        """The markdown as UTF-8 bytes: the original buffer for passthrough results"""
+        return self.data if self.data is not None else self.text_content.encode('utf-8')
+
+class ConversionOptions:
+    """Which parts of a document to convert, so engines can skip parsing the rest.
+    
+    pages and slides are 1-based range lists such as "1-3,5,9-" (an open range runs
+    to the end), sheets is a list of sheet names, max_rows caps the rows read per
+    sheet and max_output_bytes the size of the markdown. preview fills whatever is
+    unset with the PREVIEW_* limits. Invalid values raise ValueError.
+    """
+    def __init__(self, pages=None, sheets=None, slides=None, max_output_bytes=None, preview=False, max_rows=None):
+        self.preview = preview
+        self.page_ranges = self._parse_ranges(pages) if pages else None
+        self.slide_ranges = self._parse_ranges(slides) if slides else None
+        self.sheets = [name.strip() for name in sheets or () if name.strip()] or None
+        self.max_rows = int(max_rows) if max_rows else 100
+        self.max_output_bytes = int(max_output_bytes) if max_output_bytes else None
+        if self.max_rows < 1 or (self.max_output_bytes is not None and self.max_output_bytes < 1):
+            raise ValueError("Row and output limits must be positive")
+        if preview:
+            self.page_ranges = self.page_ranges or [(1, PREVIEW_PAGES)]
+            self.slide_ranges = self.slide_ranges or [(1, PREVIEW_SLIDES)]
+            self.max_rows = min(self.max_rows, PREVIEW_ROWS)
+            self.max_output_bytes = self.max_output_bytes or PREVIEW_MAX_BYTES
+    
+    @staticmethod
+    def _parse_ranges(spec):
+        ranges = []
+        for part in str(spec).replace(' ', '').split(','):
+            if not part:
+                continue
+            start, dash, end = part.partition('-')
+            try:
+                start = int(start) if start else 1
+                end = (int(end) if end else None) if dash else start
+            except ValueError:
+                raise ValueError(f"Invalid range '{part}': use numbers like 1-3,5,9-")
+            if start < 1 or (end is not None and end < start):
+                raise ValueError(f"Invalid range '{part}': use numbers like 1-3,5,9-")
+            ranges.append((start, end))
+        if not ranges:
+            raise ValueError(f"Invalid range '{spec}'")
+        return ranges
+    
+    @staticmethod
+    def _in_ranges(ranges, number):
+        return ranges is None or any(start <= number and (end is None or number <= end) for start, end in ranges)
+    
+    @staticmethod
+    def _last(ranges):
+        """Highest number the ranges can select, or None if unbounded"""
+        if ranges is None or any(end is None for _, end in ranges):
+            return None
+        return max(end for _, end in ranges)
+    
+    def includes_page(self, number):
+        return self._in_ranges(self.page_ranges, number)
+    
+    def includes_slide(self, number):
+        return self._in_ranges(self.slide_ranges, number)
+    
+    def includes_sheet(self, name):
+        return self.sheets is None or name in self.sheets
+    
+    @property
+    def last_page(self):
+        return self._last(self.page_ranges)
+    
+    @property
+    def last_slide(self):
+        return self._last(self.slide_ranges)
+    
+    @property
+    def selective(self):
+        """True if only part of a document is converted (output then differs from a full conversion)"""
+        return bool(self.page_ranges or self.slide_ranges or self.sheets or self.max_rows != 100)
+    
+    @property
+    def signature(self):
+        """Short stable digest of the options, for cache keys"""
+        fields = (self.page_ranges, self.slide_ranges, self.sheets, self.max_rows, self.max_output_bytes)
+        return hashlib.sha256(repr(fields).encode('utf-8')).hexdigest()[:16]
+    
+    def truncate(self, text):
+        """Cut text to max_output_bytes of UTF-8 without splitting a character"""
+        if self.max_output_bytes is None or len(text) * 4 <= self.max_output_bytes:
+            return text
+        data = text.encode('utf-8')
+        if len(data) <= self.max_output_bytes:
+            return text
+        return data[:self.max_output_bytes].decode('utf-8', 'ignore')
 
 class MarkItDown:
-    def __init__(self, enable_plugins=False):
+    def __init__(self, enable_plugins=False, keep_ocr_models=False, fragment_cache=None, background=None):
         self.enable_plugins = enable_plugins
+        # Store with get_fragments/put_fragments (ResultStore) for incremental reconversion
+        self.fragment_cache = fragment_cache
+        # background(fn, *args) runs cache writes off the request path; None runs them inline
+        self.background = background
+        # Load EasyOCR models once and keep them (OCR service); otherwise per image
+        self.keep_ocr_models = keep_ocr_models
+        self._ocr_reader = None
+        
+    def convert(self, source, filename=None, ocr_mode=None, options=None):
+        """Convert a file to markdown.
         
-    def convert(self, file_path):
-        """Convert a file to markdown"""
+        source is a path, bytes, or a binary file-like object; for the latter two
+        the format is taken from filename. ocr_mode picks the OCR speed/accuracy
+        tier for images (see OCR_MODES) and defaults to OCR_DEFAULT_MODE.
+        options (ConversionOptions) selects pages, sheets or slides and limits the
+        output size; by default the whole document is converted. Uploads carrying a
+        content_hash (IngestedUpload) in DOCUMENT_CACHE_EXTENSIONS (OCR'd formats)
+        are looked up in the fragment cache whole first.
+        """
         try:
-            file_extension = os.path.splitext(file_path)[1].lower()
+            if isinstance(source, (bytes, bytearray)):
+                source = io.BytesIO(source)
+            file_extension = os.path.splitext(filename or source)[1].lower()
+            options = options or ConversionOptions()
+            
+            content_hash = getattr(source, 'content_hash', None)
+            document_key = None
+            if content_hash and self.fragment_cache is not None and file_extension in DOCUMENT_CACHE_EXTENSIONS:
+                document_key = (f"{FRAGMENT_CACHE_VERSION}:document:{content_hash}:{file_extension}:"
+                                f"{ocr_mode or OCR_DEFAULT_MODE}:{options.signature}")
+                cached = self._cached_fragments([document_key])
+                if document_key in cached:
+                    return MarkItDownResult(cached[document_key])
             
             if file_extension == '.txt':
-                return self._convert_txt(file_path)
+                result = self._convert_txt(source, options)
             elif file_extension == '.rtf':
-                return self._convert_rtf(file_path)
+                result = self._convert_rtf(source)
             elif file_extension == '.pdf':
-                return self._convert_pdf(file_path)
+                result = self._convert_pdf(source, ocr_mode or OCR_DEFAULT_MODE, options)
             elif file_extension in ['.docx', '.doc']:
-                return self._convert_docx(file_path)
+                result = self._convert_docx(source, options)
             elif file_extension in ['.xlsx', '.xls']:
-                return self._convert_xlsx(file_path)
+                result = self._convert_xlsx(source, options)
             elif file_extension in ['.pptx', '.ppt']:
-                return self._convert_pptx(file_path)
+                result = self._convert_pptx(source, options)
+            elif file_extension in ['.odt', '.ods', '.odp']:
+                result = self._convert_opendocument(source, file_extension[1:], options)
             elif file_extension in ['.html', '.htm']:
-                return self._convert_html(file_path)
+                result = self._convert_html(source)
             elif file_extension == '.csv':
-                return self._convert_csv(file_path)
+                result = self._convert_csv(source, options)
             elif file_extension == '.json':
-                return self._convert_json(file_path)
+                result = self._convert_json(source)
             elif file_extension == '.xml':
-                return self._convert_xml(file_path)
+                result = self._convert_xml(source)
             elif file_extension in ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp']:
-                return self._convert_image(file_path)
+                result = self._convert_image(source, ocr_mode or OCR_DEFAULT_MODE)
             elif file_extension in ['.md', '.markdown']:
-                return self._convert_markdown(file_path)
+                result = self._convert_markdown(source, options)
             else:
                 # Fallback to text conversion
-                return self._convert_txt(file_path)
+                result = self._convert_txt(source, options)
+            
+            if result.data is not None:
+                return result  # Passthrough, only produced when there is no output limit
+            result.text_content = options.truncate(result.text_content)
+            if (document_key and len(result.text_content) <= DOCUMENT_CACHE_MAX_CHARS
+                    and not result.text_content.startswith(('Error', 'Warning'))):
+                self._store_fragments({document_key: result.text_content}, background=True)
+            return result
                 
+        except AdmissionRejected:
+            raise  # Busy OCR service, answered with 503 by admission_controlled
         except Exception as e:
             error_msg = f"Error converting file: {str(e)}"
             return MarkItDownResult(error_msg)
@@ -95,24 +288,262 @@ class MarkItDown:
             error_msg = f"Error converting URL: {str(e)}"
             return MarkItDownResult(error_msg)
     
-    def _convert_txt(self, file_path):
-        """Convert text file"""
+    def _rewind(self, source):
+        """Return a path unchanged, or a file-like object rewound to its start"""
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+        return source
+    
+    def _open_binary(self, source):
+        """Open a path, or reuse a file-like object (left open for the caller), for binary reading"""
+        if isinstance(source, (str, os.PathLike)):
+            return open(source, 'rb')
+        return contextlib.nullcontext(self._rewind(source))
+    
+    def _read_bytes(self, source, limit=None):
+        with self._open_binary(source) as f:
+            return f.read() if limit is None else f.read(limit)
+    
+    def _read_text(self, source, limit=None):
+        return ''.join(self._iter_text(source, limit))
+    
+    def _sniff_encoding(self, head):
+        """Encoding of a text file from its first bytes: BOM, then UTF-8 validity, then chardet"""
+        for bom, encoding in ((codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+                              (codecs.BOM_UTF8, 'utf-8-sig'),
+                              (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')):
+            if head.startswith(bom):
+                return encoding
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            return MarkItDownResult(content)
+            codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+            return 'utf-8'
         except UnicodeDecodeError:
-            with open(file_path, 'r', encoding='latin-1') as f:
-                content = f.read()
-            return MarkItDownResult(content)
+            pass
+        try:
+            import chardet
+            guess = chardet.detect(head)
+            if guess['encoding'] and guess['confidence'] >= 0.5:
+                encoding = codecs.lookup(guess['encoding']).name
+                # Files labelled latin-1 are nearly always cp1252 (smart quotes, euro sign)
+                return 'cp1252' if encoding in ('latin-1', 'iso8859-1', 'ascii') else encoding
+        except (ImportError, LookupError):
+            pass
+        return 'cp1252'
+    
+    def _iter_text(self, source, limit=None):
+        """Decode a text source in chunks, reading and decoding every byte once.
+        
+        The encoding is sniffed from the first TEXT_SNIFF_BYTES; bytes that turn
+        out to be invalid in it further on are taken as latin-1 rather than
+        restarting. With limit, at most that many bytes are read and a character
+        cut off at the end is dropped.
+        """
+        with self._open_binary(source) as f:
+            head = f.read(TEXT_SNIFF_BYTES if limit is None else min(limit, TEXT_SNIFF_BYTES))
+            decoder = codecs.getincrementaldecoder(self._sniff_encoding(head))('markitdown-latin-1')
+            remaining = None if limit is None else limit - len(head)
+            chunk = head
+            while chunk:
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+                if remaining == 0:
+                    return
+                chunk = f.read(TEXT_CHUNK_BYTES if remaining is None else min(remaining, TEXT_CHUNK_BYTES))
+                if remaining is not None:
+                    remaining -= len(chunk)
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+    
+    def _map_source(self, source):
+        """Whole source as a read-only buffer without decoding: an mmap for files on
+        disk, the bytes of an in-memory upload; None if it cannot be mapped"""
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                return self._map_file(f)
+        stream = getattr(source, 'spooled', source)
+        in_memory = getattr(stream, '_file', stream)  # SpooledTemporaryFile before rollover
+        if isinstance(in_memory, io.BytesIO):
+            return in_memory.getvalue()
+        try:
+            return self._map_file(stream)
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+    
+    def _map_file(self, f):
+        f.flush()  # Spooled uploads may still hold their tail in the write buffer
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return b''  # Empty files cannot be mapped
+    
+    def _utf8_passthrough(self, source):
+        """The source's bytes if it is valid UTF-8 without a BOM (so the markdown is the
+        file itself), else None. Uploads have been validated while they streamed in."""
+        is_utf8 = getattr(source, 'is_utf8', None)
+        if is_utf8 is False:
+            return None
+        data = self._map_source(source)
+        if data is None or data[:3] == codecs.BOM_UTF8:
+            return None
+        if is_utf8 is None:
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            view = memoryview(data)
+            try:
+                for start in range(0, len(view), TEXT_CHUNK_BYTES):
+                    decoder.decode(view[start:start + TEXT_CHUNK_BYTES])
+                decoder.decode(b'', final=True)
+            except UnicodeDecodeError:
+                return None
+            finally:
+                view.release()
+        return data
+    
+    def _join_chunks(self, chunks, options):
+        """Join streamed markdown, closing the stream (so the engine stops parsing)
+        once max_output_bytes is reached"""
+        parts = []
+        size = 0
+        with contextlib.closing(chunks):
+            for chunk in chunks:
+                parts.append(chunk)
+                size += len(chunk)  # Characters never outnumber UTF-8 bytes
+                if options.max_output_bytes is not None and size >= options.max_output_bytes:
+                    break
+        return ''.join(parts)
+    
+    def _source_size(self, source):
+        if isinstance(source, (str, os.PathLike)):
+            return os.path.getsize(source)
+        source.seek(0, os.SEEK_END)
+        return source.tell()
+    
+    def _source_name(self, source):
+        if isinstance(source, (str, os.PathLike)):
+            return os.path.basename(source)
+        return os.path.basename(getattr(source, 'name', None) or 'uploaded file')
+    
+    def _cached_fragments(self, keys):
+        """Look up cached markdown fragments by key; returns {key: markdown}"""
+        keys = [key for key in keys if key]
+        if self.fragment_cache is None or not keys:
+            return {}
+        try:
+            fragments = self.fragment_cache.get_fragments(keys)
+            logger.info(f"Fragment cache: reusing {len(fragments)} of {len(keys)} parts")
+            return fragments
+        except Exception as e:
+            logger.warning(f"Fragment cache lookup failed: {str(e)}")
+            return {}
+    
+    def _store_fragments(self, fragments, background=False):
+        if self.fragment_cache is None or not fragments:
+            return
+        if background and self.background is not None:
+            self.background(self._store_fragments, fragments)
+            return
+        try:
+            self.fragment_cache.put_fragments(fragments)
+        except Exception as e:
+            logger.warning(f"Fragment cache update failed: {str(e)}")
+    
+    def _part_key(self, zf, kind, part, *dependencies, memo=None):
+        """Fragment key for a ZIP member and the members its output depends on, from
+        SHA-256 digests of their decompressed content, so unchanged parts are
+        recognised without parsing them. The CRC and size in the central directory
+        are set by the uploader and cannot be trusted to identify content shared
+        between users. memo caches digests of members used in several keys.
+        None without a fragment cache."""
+        if self.fragment_cache is None:
+            return None
+        return ':'.join([FRAGMENT_CACHE_VERSION, kind] +
+                        [self._member_digest(zf, name, memo) for name in (part,) + dependencies])
+    
+    def _member_digest(self, zf, name, memo=None):
+        if name is None:
+            return '-'
+        if memo is not None and name in memo:
+            return memo[name]
+        digest = hashlib.sha256()
+        with zf.open(name) as member:  # Reading to the end also checks the CRC
+            for chunk in iter(lambda: member.read(TEXT_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        if memo is not None:
+            memo[name] = digest.hexdigest()
+        return digest.hexdigest()
+    
+    def _cached_blocks(self, blocks, key_prefix, convert):
+        """Yield markdown for body-level XML elements, given in body order as
+        (element, ends_section) pairs (element None for a bare section end), with
+        convert(element) -> markdown, reusing the fragment cache unit by unit.
+        
+        A unit runs to the end of a section, or to an element whose SHA-256
+        starts with a zero byte (one in 256 on average): a content-defined
+        boundary, so that long sections are not held in memory whole while an
+        edit still only changes the unit around it. Units are keyed on
+        key_prefix and the digests of their elements, which are cleared once
+        their unit is done. Without key_prefix each element is converted and
+        cleared straight away.
+        """
+        from lxml import etree
+        
+        if key_prefix is None:
+            for element, _ in blocks:
+                if element is not None:
+                    yield convert(element)
+                    self._release_element(element)
+            return
+        
+        new_fragments = {}
+        
+        def unit_markdown(unit, digest):
+            key = f"{key_prefix}:{digest.hexdigest()}"
+            cached = self._cached_fragments([key])
+            if key in cached:
+                markdown = cached[key]
+            else:
+                markdown = new_fragments[key] = ''.join(convert(element) for element in unit)
+            for element in unit:
+                self._release_element(element)
+            return markdown
+        
+        unit, unit_digest = [], hashlib.sha256()
+        for element, ends_section in blocks:
+            if element is not None:
+                element_digest = hashlib.sha256(etree.tostring(element)).digest()
+                unit.append(element)
+                unit_digest.update(element_digest)
+                ends_section = ends_section or element_digest[0] == 0
+            if ends_section and unit:
+                yield unit_markdown(unit, unit_digest)
+                unit, unit_digest = [], hashlib.sha256()
+        if unit:
+            yield unit_markdown(unit, unit_digest)
+        self._store_fragments(new_fragments)
+    
+    def _release_element(self, element):
+        """Clear a converted element streamed by iterparse and drop the siblings before it"""
+        parent = element.getparent()
+        element.clear()
+        while element.getprevious() is not None:
+            del parent[0]
+    
+    def _convert_txt(self, source, options):
+        """Convert text file: valid UTF-8 passes through undecoded, anything else is
+        decoded once (reading no more than max_output_bytes of it)"""
+        if options.max_output_bytes is None:
+            data = self._utf8_passthrough(source)
+            if data is not None:
+                return MarkItDownResult(data=data)
+        return MarkItDownResult(self._read_text(source, limit=options.max_output_bytes))
     
-    def _convert_rtf(self, file_path):
+    def _convert_rtf(self, source):
         """Convert RTF using striprtf"""
         try:
             from striprtf.striprtf import rtf_to_text
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                rtf_content = f.read()
+            rtf_content = self._read_text(source)
             
             # Convert RTF to plain text
             text = rtf_to_text(rtf_content)
@@ -131,8 +562,7 @@ class MarkItDown:
         except ImportError:
             # Fallback: try to extract text manually from RTF
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    rtf_content = f.read()
+                rtf_content = self._read_text(source)
                 
                 # Simple RTF text extraction (basic fallback)
                 import re
@@ -148,31 +578,62 @@ class MarkItDown:
         except Exception as e:
             return MarkItDownResult(f"Error converting RTF: {str(e)}")
     
-    def _convert_pdf(self, file_path):
-        """Convert PDF using pdfminer with maximum compatibility"""
+    def _convert_pdf(self, source, ocr_mode='balanced', options=None):
+        """Convert PDF using pdfminer with maximum compatibility.
+        
+        Text is extracted page by page; pages without a text layer (scans) are
+        rasterized and OCR'd in parallel, so OCR cost scales with the number of
+        scanned pages rather than the size of the document. Only the pages
+        selected in options are interpreted.
+        """
+        options = options or ConversionOptions()
         try:
             from pdfminer.high_level import extract_text
             import os
             
             # Check file size (limit to 125MB for PDF processing)
-            file_size = os.path.getsize(file_path)
-            if file_size > 125 * 1024 * 1024:  # 125MB limit
-                return MarkItDownResult(f"Error: PDF file too large ({file_size // (1024*1024)}MB). Maximum size is 125MB.")
+            file_size = self._source_size(source)
+            if file_size > PDF_MAX_BYTES:
+                return MarkItDownResult(f"Error: PDF file too large ({file_size // (1024*1024)}MB). Maximum size is {PDF_MAX_BYTES // (1024*1024)}MB.")
             
             # Try different extraction methods for maximum compatibility
             text = None
             
-            # Method 1: Basic extraction with no parameters (most compatible)
+            # Method 1: Page-by-page extraction, OCR for pages without a text layer
             try:
-                logger.info(f"Attempting basic PDF extraction for {os.path.basename(file_path)}")
-                text = extract_text(file_path)
+                logger.info(f"Attempting basic PDF extraction for {self._source_name(source)}")
+                page_texts, page_keys, page_numbers = self._extract_pdf_page_texts(source, options)
+                scanned_pages = [i for i, page_text in enumerate(page_texts) if not page_text.strip()]
+                if scanned_pages and PDF_OCR_ENABLED:
+                    logger.info(f"{len(scanned_pages)} of {len(page_texts)} PDF pages have no text layer, running OCR")
+                    ocr_keys = {i: f"{page_keys[i]}:ocr:{ocr_mode}" for i in scanned_pages if page_keys[i]}
+                    cached = self._cached_fragments(ocr_keys.values())
+                    for i, key in ocr_keys.items():
+                        if key in cached:
+                            page_texts[i] = cached[key]
+                    pending = [i for i in scanned_pages if ocr_keys.get(i) not in cached]
+                    if pending:
+                        # _ocr_pdf_pages works on document page numbers, page_texts only holds selected pages
+                        positions = {page_numbers[i]: i for i in pending}
+                        ocr_texts = {positions[page_number]: page_text for page_number, page_text
+                                     in self._ocr_pdf_pages(source, list(positions), ocr_mode).items()}
+                        for i, page_text in ocr_texts.items():
+                            page_texts[i] = page_text
+                        self._store_fragments({ocr_keys[i]: page_text for i, page_text in ocr_texts.items()
+                                               if i in ocr_keys and page_text.strip()})
+                text = '\n'.join(page_texts)
+            except AdmissionRejected:
+                raise
             except Exception as e1:
                 logger.info(f"Basic extraction failed: {e1}")
                 
                 # Method 2: Try with just maxpages parameter
                 try:
                     logger.info("Attempting PDF extraction with maxpages parameter")
-                    text = extract_text(file_path, maxpages=100)
+                    with self._open_binary(source) as infile:
+                        last_page = min(options.last_page or 100, 100)
+                        selected = {n - 1 for n in range(1, last_page + 1) if options.includes_page(n)}
+                        text = extract_text(infile, maxpages=last_page, page_numbers=selected)
                 except Exception as e2:
                     logger.info(f"Maxpages extraction failed: {e2}")
                     
@@ -190,9 +651,11 @@ class MarkItDown:
                         converter = TextConverter(manager, output, laparams=LAParams())
                         interpreter = PDFPageInterpreter(manager, converter)
                         
-                        with open(file_path, 'rb') as infile:
+                        with self._open_binary(source) as infile:
                             page_count = 0
-                            for page in PDFPage.get_pages(infile, check_extractable=True):
+                            for page_number, page in enumerate(PDFPage.get_pages(infile, check_extractable=True), 1):
+                                if not options.includes_page(page_number):
+                                    continue
                                 interpreter.process_page(page)
                                 page_count += 1
                                 if page_count >= 50:  # Limit to first 50 pages
@@ -223,15 +686,179 @@ class MarkItDown:
             
         except ImportError:
             return MarkItDownResult("Error: PDF processing library not available. Please install pdfminer.six.")
+        except AdmissionRejected:
+            raise
         except Exception as e:
-            logger.error(f"PDF conversion error for {file_path}: {str(e)}")
+            logger.error(f"PDF conversion error for {self._source_name(source)}: {str(e)}")
             return MarkItDownResult(f"Error converting PDF: {str(e)}. This may be due to a corrupted file, password protection, or unsupported PDF format.")
     
-    def _convert_docx(self, file_path):
-        """Convert DOCX using python-docx"""
+    def _extract_pdf_page_texts(self, source, options):
+        """Extract the text of each selected PDF page separately (same layout analysis as extract_text).
+        
+        Returns (page_texts, page_keys, page_numbers), page_numbers being the 0-based
+        document page of each entry. Pages whose content fingerprint is already in
+        the fragment cache are not laid out again, and pages after the last selected
+        one are not even read from the page tree.
+        """
+        from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfpage import PDFPage
+        from io import StringIO
+        
+        output = StringIO()
+        manager = PDFResourceManager()
+        converter = TextConverter(manager, output, laparams=LAParams())
+        interpreter = PDFPageInterpreter(manager, converter)
+        
+        try:
+            with self._open_binary(source) as infile:
+                pages = []
+                page_numbers = []
+                for page_number, page in enumerate(PDFPage.get_pages(infile, maxpages=options.last_page or 0)):
+                    if options.includes_page(page_number + 1):
+                        pages.append(page)
+                        page_numbers.append(page_number)
+                # Fingerprint every page before any is interpreted: pdfminer decodes
+                # shared streams in place, which would otherwise change later keys
+                page_keys = [None] * len(pages)
+                if self.fragment_cache is not None:
+                    memo = {}
+                    for i, page in enumerate(pages):
+                        try:
+                            page_keys[i] = self._pdf_page_key(page, memo)
+                        except Exception as e:
+                            logger.debug(f"Could not fingerprint PDF page {i + 1}: {str(e)}")
+                cached = self._cached_fragments(page_keys)
+                
+                page_texts = []
+                new_fragments = {}
+                size = 0
+                for page, key in zip(pages, page_keys):
+                    if options.max_output_bytes is not None and size >= options.max_output_bytes:
+                        break  # Enough text for the output limit
+                    if key in cached:
+                        page_texts.append(cached[key])
+                    else:
+                        interpreter.process_page(page)
+                        page_texts.append(output.getvalue())
+                        output.seek(0)
+                        output.truncate(0)
+                        if key:
+                            new_fragments[key] = page_texts[-1]
+                    size += len(page_texts[-1])
+        finally:
+            converter.close()
+        self._store_fragments(new_fragments)
+        return page_texts, page_keys[:len(page_texts)], page_numbers[:len(page_texts)]
+    
+    def _pdf_page_key(self, page, memo):
+        """Fragment key for a PDF page: a hash of its content streams, the resources they
+        draw on (fonts, images, forms) and its media box. Digests of indirect objects are
+        memoised by object id, so resources shared across pages are hashed once."""
+        from pdfminer.pdftypes import PDFObjRef, PDFStream
+        
+        def object_digest(obj, depth=0):
+            if isinstance(obj, PDFObjRef):
+                if obj.objid not in memo:
+                    memo[obj.objid] = b'cycle'  # Placeholder breaks reference cycles
+                    memo[obj.objid] = object_digest(obj.resolve(), depth + 1)
+                return memo[obj.objid]
+            h = hashlib.sha256()
+            if depth > 32:
+                h.update(b'deep')
+            elif isinstance(obj, PDFStream):
+                h.update(object_digest(obj.attrs, depth + 1))
+                h.update(obj.rawdata if obj.rawdata is not None else obj.get_data())
+            elif isinstance(obj, dict):
+                for name in sorted(obj, key=str):
+                    if name in ('Parent', 'P'):
+                        continue  # Back-references to the page tree would tie every page together
+                    h.update(repr(name).encode())
+                    h.update(object_digest(obj[name], depth + 1))
+            elif isinstance(obj, (list, tuple)):
+                for item in obj:
+                    h.update(object_digest(item, depth + 1))
+            else:
+                h.update(repr(obj).encode())
+            return h.digest()
+        
+        h = hashlib.sha256()
+        for stream in page.contents:
+            h.update(object_digest(stream))
+        h.update(object_digest(page.resources))
+        h.update(repr(page.mediabox).encode())
+        return f"{FRAGMENT_CACHE_VERSION}:pdf-page:{h.hexdigest()}"
+    
+    def _ocr_pdf_pages(self, source, page_numbers, ocr_mode):
+        """Rasterize the given 0-based pages at PDF_OCR_DPI and OCR them in parallel.
+        Returns {page_number: text} for the pages where text was found.
+        
+        In-process OCR loads the EasyOCR models once for the document and shares
+        them between the workers. Rendering stays at most PDF_OCR_READ_AHEAD pages
+        ahead of the workers, so page images do not pile up in memory."""
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            logger.warning("pypdfium2 not available - scanned PDF pages cannot be OCR'd. Install with: pip install pypdfium2")
+            return {}
+        
+        if len(page_numbers) > PDF_MAX_OCR_PAGES:
+            logger.warning(f"Only the first {PDF_MAX_OCR_PAGES} scanned PDF pages will be OCR'd")
+            page_numbers = page_numbers[:PDF_MAX_OCR_PAGES]
+        
+        reader_lock = threading.Lock()
+        readers = []
+        
+        def load_reader(model_dir):
+            with reader_lock:
+                if not readers:
+                    readers.append(self._load_ocr_reader(model_dir))
+                return readers[0]
+        
+        futures = {}
+        pdf = pdfium.PdfDocument(self._rewind(source))
+        try:
+            # pdfium is not thread-safe: render here, OCR each page on the pool as soon as it is ready
+            with ThreadPoolExecutor(max_workers=PDF_OCR_WORKERS) as executor:
+                for page_number in page_numbers:
+                    pending = [future for future in futures.values() if not future.done()]
+                    if len(pending) >= PDF_OCR_WORKERS + PDF_OCR_READ_AHEAD:
+                        wait(pending, return_when=FIRST_COMPLETED)
+                    page = pdf[page_number]
+                    try:
+                        image = page.render(scale=PDF_OCR_DPI / 72, grayscale=True).to_pil()
+                    finally:
+                        page.close()
+                    page_image = io.BytesIO()
+                    image.save(page_image, format='PNG')
+                    page_image.name = f"page-{page_number + 1}.png"
+                    futures[page_number] = executor.submit(self._convert_image, page_image, ocr_mode, load_reader)
+        finally:
+            pdf.close()
+        
+        page_texts = {}
+        for page_number, future in futures.items():
+            page_text = future.result().text_content
+            if page_text.startswith("Error") or page_text == "No text could be extracted from this image.":
+                logger.warning(f"OCR found no text on PDF page {page_number + 1}")
+                continue
+            page_texts[page_number] = page_text
+        return page_texts
+    
+    def _convert_docx(self, source, options):
+        """Convert DOCX with the streaming OOXML engine, falling back to python-docx"""
+        try:
+            return MarkItDownResult(self._join_chunks(self._stream_docx(source), options))
+        except Exception as e:
+            logger.warning(f"Streaming DOCX conversion failed ({str(e)}), using python-docx")
+            return self._convert_docx_object_model(source)
+    
+    def _convert_docx_object_model(self, source):
+        """Convert DOCX using python-docx (tables are emitted after all paragraphs)"""
         try:
             from docx import Document
-            doc = Document(file_path)
+            doc = Document(self._rewind(source))
             
             markdown = ""
             for paragraph in doc.paragraphs:
@@ -261,44 +888,298 @@ class MarkItDown:
         except Exception as e:
             return MarkItDownResult(f"Error converting DOCX: {str(e)}")
     
-    def _convert_xlsx(self, file_path):
-        """Convert Excel using openpyxl"""
+    def _ooxml_relationships(self, zf, part_name):
+        """Map the relationship IDs of an OOXML part ('' for the package) to (type, part name)"""
+        from lxml import etree
+        
+        directory, name = posixpath.split(part_name)
+        relationships = {}
+        try:
+            rels_file = zf.open(posixpath.join(directory, '_rels', name + '.rels'))
+        except KeyError:
+            return relationships
+        with rels_file:
+            for rel in etree.parse(rels_file).getroot():
+                target = rel.get('Target', '')
+                if rel.get('TargetMode') == 'External':
+                    continue
+                if target.startswith('/'):
+                    part = target.lstrip('/')
+                else:
+                    part = posixpath.normpath(posixpath.join(directory, target))
+                relationships[rel.get('Id')] = (rel.get('Type', ''), part)
+        return relationships
+    
+    def _ooxml_main_part(self, zf, default):
+        for rel_type, part in self._ooxml_relationships(zf, '').values():
+            if rel_type.endswith('/officeDocument'):
+                return part
+        return default
+    
+    def _docx_styles_part(self, zf, document_part):
+        for rel_type, part in self._ooxml_relationships(zf, document_part).values():
+            if rel_type.endswith('/styles') and part in zf.NameToInfo:
+                return part
+        return None
+    
+    def _docx_style_names(self, zf, styles_part):
+        """Resolve paragraph style IDs to names once from styles.xml; returns (names, default name)"""
+        from lxml import etree
+        
+        names = {}
+        default_name = None
+        if styles_part is not None:
+            with zf.open(styles_part) as styles_file:
+                for style in etree.parse(styles_file).getroot().iter(W_NS + 'style'):
+                    if style.get(W_NS + 'type') != 'paragraph':
+                        continue
+                    style_id = style.get(W_NS + 'styleId')
+                    name = style.find(W_NS + 'name')
+                    names[style_id] = name.get(W_NS + 'val') if name is not None else style_id
+                    if style.get(W_NS + 'default') in ('1', 'true'):
+                        default_name = names[style_id]
+        return names, default_name
+    
+    def _docx_text(self, paragraph):
+        """Text of a w:p the way python-docx reads it: runs and hyperlinked runs only"""
+        parts = []
+        for child in paragraph:
+            if child.tag == W_NS + 'hyperlink':
+                runs = child.iterchildren(W_NS + 'r')
+            elif child.tag == W_NS + 'r':
+                runs = (child,)
+            else:
+                continue
+            for run in runs:
+                for node in run:
+                    tag = node.tag
+                    if tag == W_NS + 't':
+                        parts.append(node.text or '')
+                    elif tag in (W_NS + 'tab', W_NS + 'ptab'):
+                        parts.append('\t')
+                    elif tag == W_NS + 'cr':
+                        parts.append('\n')
+                    elif tag == W_NS + 'br' and node.get(W_NS + 'type', 'textWrapping') == 'textWrapping':
+                        parts.append('\n')
+                    elif tag == W_NS + 'noBreakHyphen':
+                        parts.append('-')
+        return ''.join(parts)
+    
+    def _docx_paragraph_markdown(self, paragraph, style_names, default_style):
+        text = self._docx_text(paragraph).strip()
+        if not text:
+            return ''
+        style = paragraph.find(f'{W_NS}pPr/{W_NS}pStyle')
+        style_name = style_names.get(style.get(W_NS + 'val'), default_style) if style is not None else default_style
+        
+        # Basic heading detection
+        if style_name and style_name.lower().startswith('heading'):
+            level = style_name[len('heading'):].strip()
+            if level.isdigit():
+                return f"{'#' * int(level)} {text}\n\n"
+            return f"## {text}\n\n"
+        return f"{text}\n\n"
+    
+    def _docx_table_markdown(self, table):
+        """Markdown for a w:tbl; merged cells repeat their text like python-docx row.cells"""
+        rows = []
+        previous_row = []
+        for row in table.iterchildren(W_NS + 'tr'):
+            cells = []
+            for cell in row.iterchildren(W_NS + 'tc'):
+                span = 1
+                continues_merge = False
+                properties = cell.find(W_NS + 'tcPr')
+                if properties is not None:
+                    grid_span = properties.find(W_NS + 'gridSpan')
+                    if grid_span is not None:
+                        span = int(grid_span.get(W_NS + 'val', '1'))
+                    v_merge = properties.find(W_NS + 'vMerge')
+                    continues_merge = v_merge is not None and v_merge.get(W_NS + 'val', 'continue') != 'restart'
+                
+                column = len(cells)
+                if continues_merge and column < len(previous_row):
+                    text = previous_row[column]
+                else:
+                    text = '\n'.join(self._docx_text(p) for p in cell.iterchildren(W_NS + 'p')).strip()
+                cells.extend([text] * span)
+            rows.append(cells)
+            previous_row = cells
+        
+        markdown = "\n"
+        for i, cells in enumerate(rows):
+            markdown += "| " + " | ".join(cells) + " |\n"
+            if i == 0:  # Header row
+                markdown += "| " + " | ".join(["---"] * len(cells)) + " |\n"
+        return markdown + "\n"
+    
+    def _stream_docx(self, source):
+        """Yield markdown for a DOCX in body order by streaming the document part with iterparse.
+        
+        Only body-level w:p and w:tbl elements are converted, and each is cleared
+        once converted, so memory stays bounded by the largest single paragraph or
+        table (or cache unit) rather than the whole document.
+        
+        An unchanged document part is taken from the fragment cache whole, without
+        parsing it; otherwise sections (split at each w:sectPr) are reused one by
+        one, see _cached_blocks.
+        """
+        from lxml import etree
+        
+        with self._open_binary(source) as f, zipfile.ZipFile(f) as zf:
+            document_part = self._ooxml_main_part(zf, 'word/document.xml')
+            styles_part = self._docx_styles_part(zf, document_part)
+            key = self._part_key(zf, 'docx-body', document_part, styles_part)
+            cached = self._cached_fragments([key])
+            if key in cached:
+                yield cached[key]
+                return
+            style_names, default_style = self._docx_style_names(zf, styles_part)
+            
+            def convert(elem):
+                if elem.tag == W_NS + 'p':
+                    return self._docx_paragraph_markdown(elem, style_names, default_style)
+                return self._docx_table_markdown(elem)
+            
+            def body_blocks(document):
+                for _, elem in etree.iterparse(document, events=('end',), tag=(W_NS + 'p', W_NS + 'tbl', W_NS + 'sectPr')):
+                    body = elem.getparent()
+                    if body is None or body.tag != W_NS + 'body':
+                        continue  # Paragraphs inside tables are converted with their table
+                    if elem.tag == W_NS + 'sectPr':
+                        yield None, True  # Properties of the last section
+                    else:
+                        # A paragraph holding section properties ends its section
+                        yield elem, elem.find(f'{W_NS}pPr/{W_NS}sectPr') is not None
+            
+            blocks = []
+            with zf.open(document_part) as document:
+                section_prefix = self._part_key(zf, 'docx-section', styles_part)
+                for block in self._cached_blocks(body_blocks(document), section_prefix, convert):
+                    blocks.append(block)
+                    yield block
+            self._store_fragments({key: ''.join(blocks)})
+    
+    def _convert_xlsx(self, source, options):
+        """Convert Excel using openpyxl, reading only selected sheets missing from the fragment cache"""
         try:
             from openpyxl import load_workbook
-            wb = load_workbook(file_path)
+            
+            sheet_keys = {name: key for name, key in self._xlsx_sheet_keys(source, options.max_rows).items()
+                          if options.includes_sheet(name)}
+            cached = self._cached_fragments(sheet_keys.values())
+            new_fragments = {}
+            wb = None
             
             markdown = ""
-            for sheet_name in wb.sheetnames:
-                sheet = wb[sheet_name]
-                markdown += f"# {sheet_name}\n\n"
-                
-                # Get all rows with data
-                rows = []
-                for row in sheet.iter_rows(values_only=True):
-                    if any(cell is not None for cell in row):
-                        rows.append([str(cell) if cell is not None else "" for cell in row])
+            try:
+                sheet_names = list(sheet_keys)
+                if not sheet_names or len(cached) < len(sheet_names):
+                    # Read-only mode parses each worksheet lazily, when it is accessed
+                    wb = load_workbook(self._rewind(source), read_only=True)
+                    sheet_names = sheet_names or [name for name in wb.sheetnames if options.includes_sheet(name)]
+                    if not sheet_names:
+                        return MarkItDownResult(f"Error: No sheet named {', '.join(options.sheets)}. Available sheets: {', '.join(wb.sheetnames)}")
                 
-                if rows:
-                    # Create table
-                    for i, row in enumerate(rows[:100]):  # Limit to first 100 rows
-                        markdown += "| " + " | ".join(row) + " |\n"
-                        if i == 0:  # Header row
-                            markdown += "| " + " | ".join(["---"] * len(row)) + " |\n"
-                    markdown += "\n"
+                for sheet_name in sheet_names:
+                    markdown += f"# {sheet_name}\n\n"
+                    key = sheet_keys.get(sheet_name)
+                    if key in cached:
+                        markdown += cached[key]
+                        continue
+                    worksheet = wb[sheet_name]
+                    # Read-only rows are padded to the stored <dimension>, which is often inflated
+                    worksheet.reset_dimensions()
+                    sheet_markdown = self._sheet_rows_markdown(worksheet.iter_rows(values_only=True), options.max_rows)
+                    if key:
+                        new_fragments[key] = sheet_markdown
+                    markdown += sheet_markdown
+            finally:
+                if wb is not None:
+                    wb.close()
             
+            self._store_fragments(new_fragments)
             return MarkItDownResult(markdown)
         except Exception as e:
             return MarkItDownResult(f"Error converting Excel: {str(e)}")
     
-    def _convert_pptx(self, file_path):
+    def _sheet_rows_markdown(self, rows, max_rows=100):
+        """Markdown table of the first max_rows non-empty rows (sequences of cell values,
+        None for empty cells, trailing ones dropped); stops consuming rows there"""
+        window = []
+        for row in rows:
+            row = list(row)
+            while row and row[-1] is None:
+                row.pop()
+            if not row:
+                continue
+            window.append([str(cell) if cell is not None else "" for cell in row])
+            if len(window) >= max_rows:
+                break
+        if not window:
+            return ""
+        
+        width = max(len(cells) for cells in window)
+        markdown = ""
+        for i, cells in enumerate(window):
+            cells += [""] * (width - len(cells))
+            markdown += "| " + " | ".join(cells) + " |\n"
+            if i == 0:  # Header row
+                markdown += "| " + " | ".join(["---"] * width) + " |\n"
+        return markdown + "\n"
+    
+    def _xlsx_sheet_keys(self, source, max_rows=100):
+        """Return {sheet name: fragment key} in workbook order, or {} if the workbook
+        cannot be read as an OOXML package. A sheet's output also depends on the
+        shared strings and styles, so their digests are part of every key."""
+        from lxml import etree
+        
+        try:
+            with self._open_binary(source) as f, zipfile.ZipFile(f) as zf:
+                workbook_part = self._ooxml_main_part(zf, 'xl/workbook.xml')
+                relationships = self._ooxml_relationships(zf, workbook_part)
+                shared_strings = styles = None
+                for rel_type, part in relationships.values():
+                    if rel_type.endswith('/sharedStrings'):
+                        shared_strings = part
+                    elif rel_type.endswith('/styles'):
+                        styles = part
+                
+                with zf.open(workbook_part) as workbook_file:
+                    workbook = etree.parse(workbook_file).getroot()
+                workbook_properties = workbook.find(S_NS + 'workbookPr')
+                date1904 = workbook_properties.get('date1904', '0') if workbook_properties is not None else '0'
+                
+                sheet_keys = {}
+                memo = {}
+                for sheet in workbook.iter(S_NS + 'sheet'):
+                    sheet_part = relationships[sheet.get(R_NS + 'id')][1]
+                    key = self._part_key(zf, 'xlsx-sheet', sheet_part, shared_strings, styles, memo=memo)
+                    sheet_keys[sheet.get('name')] = key and f"{key}:{date1904}:{max_rows}"
+                return sheet_keys
+        except Exception as e:
+            logger.info(f"Sheet-level caching unavailable for this workbook: {str(e)}")
+            return {}
+    
+    def _convert_pptx(self, source, options):
+        """Convert PowerPoint with the streaming OOXML engine, falling back to python-pptx"""
+        try:
+            return MarkItDownResult(self._join_chunks(self._stream_pptx(source, options), options))
+        except Exception as e:
+            logger.warning(f"Streaming PowerPoint conversion failed ({str(e)}), using python-pptx")
+            return self._convert_pptx_object_model(source, options)
+    
+    def _convert_pptx_object_model(self, source, options=None):
         """Convert PowerPoint using python-pptx"""
         try:
             from pptx import Presentation
-            prs = Presentation(file_path)
+            prs = Presentation(self._rewind(source))
             
             markdown = "# Presentation\n\n"
             
             for i, slide in enumerate(prs.slides, 1):
+                if options and not options.includes_slide(i):
+                    continue
                 markdown += f"## Slide {i}\n\n"
                 
                 for shape in slide.shapes:
@@ -311,13 +1192,336 @@ class MarkItDown:
         except Exception as e:
             return MarkItDownResult(f"Error converting PowerPoint: {str(e)}")
     
-    def _convert_html(self, file_path):
+    def _pptx_shape_text(self, shape):
+        """Text of a p:sp the way python-pptx shape.text reads it"""
+        text_body = shape.find(P_NS + 'txBody')
+        if text_body is None:
+            return ''
+        paragraphs = []
+        for paragraph in text_body.iterchildren(A_NS + 'p'):
+            parts = []
+            for node in paragraph:
+                if node.tag in (A_NS + 'r', A_NS + 'fld'):
+                    parts.append(node.findtext(A_NS + 't') or '')
+                elif node.tag == A_NS + 'br':
+                    parts.append('\v')
+            paragraphs.append(''.join(parts))
+        return '\n'.join(paragraphs)
+    
+    def _stream_pptx(self, source, options):
+        """Yield markdown for a PPTX slide by slide, reading each slide part with iterparse.
+        Slides outside the selected ranges are never opened."""
+        from lxml import etree
+        
+        with self._open_binary(source) as f, zipfile.ZipFile(f) as zf:
+            presentation_part = self._ooxml_main_part(zf, 'ppt/presentation.xml')
+            relationships = self._ooxml_relationships(zf, presentation_part)
+            with zf.open(presentation_part) as presentation:
+                slide_ids = [slide_id.get(R_NS + 'id') for slide_id in etree.parse(presentation).getroot().iter(P_NS + 'sldId')]
+            
+            # Unchanged slides (same part digest) are taken from the fragment cache
+            slides = [(i, relationships[slide_id][1]) for i, slide_id in enumerate(slide_ids, 1) if options.includes_slide(i)]
+            slide_keys = [self._part_key(zf, 'pptx-slide', part) for _, part in slides]
+            cached = self._cached_fragments(slide_keys)
+            new_fragments = {}
+            
+            yield "# Presentation\n\n"
+            for (i, slide_part), key in zip(slides, slide_keys):
+                yield f"## Slide {i}\n\n"
+                if key in cached:
+                    yield cached[key]
+                    continue
+                
+                slide_markdown = ""
+                with zf.open(slide_part) as slide:
+                    for _, shape in etree.iterparse(slide, events=('end',), tag=P_NS + 'sp'):
+                        # Top-level shapes only, as python-pptx slide.shapes
+                        parent = shape.getparent()
+                        if parent is None or parent.tag != P_NS + 'spTree':
+                            continue
+                        text = self._pptx_shape_text(shape).strip()
+                        if text:
+                            slide_markdown += f"{text}\n\n"
+                        shape.clear()
+                new_fragments[key] = slide_markdown
+                yield slide_markdown
+            
+            self._store_fragments(new_fragments)
+    
+    def _convert_opendocument(self, source, kind, options):
+        """Convert ODT, ODS or ODP with the streaming OpenDocument engine"""
+        try:
+            return MarkItDownResult(self._join_chunks(self._stream_opendocument(source, kind, options), options))
+        except Exception as e:
+            return MarkItDownResult(f"Error converting OpenDocument: {str(e)}")
+    
+    def _stream_opendocument(self, source, kind, options):
+        """Yield markdown for an OpenDocument file by streaming content.xml with iterparse.
+        
+        Text, sheets and slides all live in content.xml. For full conversions an
+        unchanged part is taken from the fragment cache whole, without parsing it;
+        otherwise sheets, slides and runs of text blocks are reused one by one
+        (see _ods_blocks, _odp_blocks and _odt_blocks).
+        """
+        blocks = {'odt': self._odt_blocks, 'ods': self._ods_blocks, 'odp': self._odp_blocks}[kind]
+        with self._open_binary(source) as f, zipfile.ZipFile(f) as zf:
+            key = None if options.selective else self._part_key(zf, kind, 'content.xml')
+            cached = self._cached_fragments([key])
+            if key in cached:
+                yield cached[key]
+                return
+            
+            chunks = []
+            with zf.open('content.xml') as content:
+                for chunk in blocks(content, options):
+                    chunks.append(chunk)
+                    yield chunk
+            if key:
+                self._store_fragments({key: ''.join(chunks)})
+    
+    def _odf_text(self, element):
+        """Text of an ODF paragraph or heading, expanding spaces, tabs and line breaks"""
+        parts = [element.text or '']
+        for child in element:
+            tag = child.tag
+            if tag == TEXT_NS + 's':
+                parts.append(' ' * int(child.get(TEXT_NS + 'c', '1')))
+            elif tag == TEXT_NS + 'tab':
+                parts.append('\t')
+            elif tag == TEXT_NS + 'line-break':
+                parts.append('\n')
+            elif tag not in (TEXT_NS + 'note', OFFICE_NS + 'annotation'):
+                parts.append(self._odf_text(child))
+            parts.append(child.tail or '')
+        return ''.join(parts)
+    
+    def _odf_list_lines(self, text_list, depth=0):
+        lines = []
+        for item in text_list.iterchildren(TEXT_NS + 'list-item', TEXT_NS + 'list-header'):
+            marker = '- '
+            for child in item:
+                if child.tag == TEXT_NS + 'list':
+                    lines.extend(self._odf_list_lines(child, depth + 1))
+                elif child.tag in (TEXT_NS + 'p', TEXT_NS + 'h'):
+                    text = self._odf_text(child).strip()
+                    if text:
+                        lines.append(f"{'  ' * depth}{marker}{text}")
+                        marker = '  '  # Further paragraphs of the item are continuations
+        return lines
+    
+    def _odf_row_cells(self, row):
+        """Cell text of a table:table-row (None for empty cells) and its repeat count.
+        
+        Repeated cells are expanded, except runs of empty cells at the end of the row,
+        which spreadsheets repeat up to the column limit. Empty rows count once.
+        """
+        cells = []
+        pending_empty = 0
+        for cell in row.iterchildren(TABLE_NS + 'table-cell', TABLE_NS + 'covered-table-cell'):
+            repeat = int(cell.get(TABLE_NS + 'number-columns-repeated', '1'))
+            text = '\n'.join(self._odf_text(p) for p in cell.iterchildren(TEXT_NS + 'p', TEXT_NS + 'h')).strip()
+            if not text:
+                pending_empty += repeat
+                continue
+            cells.extend([None] * pending_empty)
+            cells.extend([text] * repeat)
+            pending_empty = 0
+        repeat = int(row.get(TABLE_NS + 'number-rows-repeated', '1')) if cells else 1
+        return cells, repeat
+    
+    def _odf_table_rows(self, table):
+        for row in table.iter(TABLE_NS + 'table-row'):
+            if next(row.iterancestors(TABLE_NS + 'table')) is not table:
+                continue  # Rows of a table nested inside a cell
+            cells, repeat = self._odf_row_cells(row)
+            for _ in range(repeat):
+                yield cells
+    
+    def _odf_table_markdown(self, table):
+        """Markdown for a text or slide table, in the same layout as DOCX tables"""
+        rows = [[cell or '' for cell in cells] for cells in self._odf_table_rows(table)]
+        if not rows:
+            return ''
+        width = max(len(cells) for cells in rows)
+        markdown = "\n"
+        for i, cells in enumerate(rows):
+            markdown += "| " + " | ".join(cells + [''] * (width - len(cells))) + " |\n"
+            if i == 0:  # Header row
+                markdown += "| " + " | ".join(["---"] * width) + " |\n"
+        return markdown + "\n"
+    
+    def _odt_blocks(self, content, options):
+        """Yield markdown for the body-level headings, paragraphs, lists and tables of an ODT,
+        reusing cached runs of them (see _cached_blocks)"""
+        from lxml import etree
+        
+        containers = (OFFICE_NS + 'text', TEXT_NS + 'section')
+        tags = (TEXT_NS + 'h', TEXT_NS + 'p', TEXT_NS + 'list', TABLE_NS + 'table')
+        
+        def body_blocks():
+            for _, elem in etree.iterparse(content, events=('end',), tag=tags):
+                parent = elem.getparent()
+                if parent is None or parent.tag not in containers:
+                    continue  # Converted with the list, table or frame that contains it
+                yield elem, False
+        
+        key_prefix = None if self.fragment_cache is None else f"{FRAGMENT_CACHE_VERSION}:odt-blocks"
+        yield from self._cached_blocks(body_blocks(), key_prefix, self._odt_block_markdown)
+    
+    def _odt_block_markdown(self, elem):
+        if elem.tag == TEXT_NS + 'h':
+            text = self._odf_text(elem).strip()
+            if text:
+                level = min(int(elem.get(TEXT_NS + 'outline-level', '1')), 6)
+                return f"{'#' * level} {text}\n\n"
+        elif elem.tag == TEXT_NS + 'p':
+            text = self._odf_text(elem).strip()
+            if text:
+                return f"{text}\n\n"
+        elif elem.tag == TEXT_NS + 'list':
+            lines = self._odf_list_lines(elem)
+            if lines:
+                return '\n'.join(lines) + "\n\n"
+        else:
+            return self._odf_table_markdown(elem)
+        return ''
+    
+    def _ods_blocks(self, content, options):
+        """Yield markdown sheet by sheet for an ODS, in the same layout as XLSX.
+        
+        Rows are read as they are parsed and cleared straight away; once a sheet's
+        row window is full, and for sheets that are not selected, rows are skipped
+        without building cell text. Parsing stops after the last selected sheet.
+        If none of the requested sheets exists, the output is an error, as for XLSX.
+        With a fragment cache, every row of a selected sheet is hashed as it goes
+        by, and the sheet's markdown is reused when an identical sheet was
+        converted before.
+        """
+        from lxml import etree
+        
+        events = etree.iterparse(content, events=('start', 'end'), tag=(TABLE_NS + 'table', TABLE_NS + 'table-row'))
+        remaining = set(options.sheets or ())
+        sheet_names = []
+        new_fragments = {}
+        
+        def sheet_rows(sheet, max_rows, digest=None):
+            # Consumes events up to the end of the sheet; after max_rows rows are
+            # yielded the remaining rows are only cleared (and hashed), not read
+            yielded = 0
+            for event, elem in events:
+                if elem is sheet:
+                    return
+                if event != 'end' or elem.tag != TABLE_NS + 'table-row':
+                    continue
+                if digest is not None:
+                    digest.update(etree.tostring(elem))
+                cells, repeat = [], 0
+                if yielded < max_rows and next(elem.iterancestors(TABLE_NS + 'table')) is sheet:
+                    cells, repeat = self._odf_row_cells(elem)
+                parent = elem.getparent()
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del parent[0]
+                if not cells:
+                    continue
+                for _ in range(min(repeat, max_rows - yielded)):
+                    yielded += 1
+                    yield cells
+        
+        for event, elem in events:
+            if event != 'start' or elem.tag != TABLE_NS + 'table':
+                continue
+            if elem.getparent() is None or elem.getparent().tag != OFFICE_NS + 'spreadsheet':
+                continue
+            name = elem.get(TABLE_NS + 'name', '')
+            sheet_names.append(name)
+            if options.includes_sheet(name) and self.fragment_cache is not None:
+                yield f"# {name}\n\n"
+                # The whole sheet is hashed before its key can be looked up
+                digest = hashlib.sha256()
+                rows = list(sheet_rows(elem, options.max_rows, digest))
+                key = f"{FRAGMENT_CACHE_VERSION}:ods-sheet:{digest.hexdigest()}:{options.max_rows}"
+                cached = self._cached_fragments([key])
+                if key in cached:
+                    yield cached[key]
+                else:
+                    new_fragments[key] = self._sheet_rows_markdown(rows, options.max_rows)
+                    yield new_fragments[key]
+            elif options.includes_sheet(name):
+                yield f"# {name}\n\n"
+                rows = sheet_rows(elem, options.max_rows)
+                yield self._sheet_rows_markdown(rows, options.max_rows)
+            else:
+                rows = sheet_rows(elem, 0)
+            for _ in rows:
+                pass  # Run on to the end of the sheet
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+            if options.sheets is not None:
+                remaining.discard(name)
+                if not remaining:
+                    break
+        
+        self._store_fragments(new_fragments)
+        if options.sheets is not None and remaining == set(options.sheets):
+            yield f"Error: No sheet named {', '.join(options.sheets)}. Available sheets: {', '.join(sheet_names)}"
+    
+    def _odp_blocks(self, content, options):
+        """Yield markdown for an ODP slide by slide, in the same layout as PPTX.
+        Unselected slides are dropped unread and parsing stops after the last selected one.
+        Slides identical to one converted before (same XML digest) come from the fragment cache."""
+        from lxml import etree
+        
+        yield "# Presentation\n\n"
+        last_slide = options.last_slide
+        new_fragments = {}
+        for i, (_, page) in enumerate(etree.iterparse(content, events=('end',), tag=DRAW_NS + 'page'), 1):
+            if last_slide is not None and i > last_slide:
+                break
+            if options.includes_slide(i):
+                yield f"## Slide {i}\n\n"
+                if self.fragment_cache is None:
+                    yield from self._odp_page_blocks(page)
+                else:
+                    key = f"{FRAGMENT_CACHE_VERSION}:odp-slide:{hashlib.sha256(etree.tostring(page)).hexdigest()}"
+                    cached = self._cached_fragments([key])
+                    if key in cached:
+                        yield cached[key]
+                    else:
+                        new_fragments[key] = ''.join(self._odp_page_blocks(page))
+                        yield new_fragments[key]
+            page.clear()
+            while page.getprevious() is not None:
+                del page.getparent()[0]
+        self._store_fragments(new_fragments)
+    
+    def _odp_page_blocks(self, page):
+        """Yield the text and tables of the shapes on a draw:page"""
+        for shape in page.iter(DRAW_NS + 'frame', DRAW_NS + 'custom-shape', DRAW_NS + 'rect', DRAW_NS + 'ellipse'):
+            if next(shape.iterancestors(PRESENTATION_NS + 'notes', DRAW_NS + 'frame'), None) is not None:
+                continue  # Speaker notes and shapes nested in a frame
+            table = shape.find(TABLE_NS + 'table')
+            if table is not None:
+                yield self._odf_table_markdown(table)
+                continue
+            paragraphs = []
+            for block in shape.iter(TEXT_NS + 'p', TEXT_NS + 'h', TEXT_NS + 'list'):
+                if block.tag == TEXT_NS + 'list':
+                    if block.getparent().tag != TEXT_NS + 'list-item':
+                        paragraphs.extend(self._odf_list_lines(block))
+                elif next(block.iterancestors(TEXT_NS + 'list'), None) is None:
+                    paragraphs.append(self._odf_text(block))
+            text = '\n'.join(paragraphs).strip()
+            if text:
+                yield f"{text}\n\n"
+    
+    def _convert_html(self, source):
         """Convert HTML using BeautifulSoup"""
         try:
             from bs4 import BeautifulSoup
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = self._read_text(source)
             
             soup = BeautifulSoup(content, 'html.parser')
             
@@ -335,35 +1539,33 @@ class MarkItDown:
         except Exception as e:
             return MarkItDownResult(f"Error converting HTML: {str(e)}")
     
-    def _convert_csv(self, file_path):
-        """Convert CSV using pandas"""
+    def _convert_csv(self, source, options):
+        """Convert CSV using pandas (only the first max_rows rows in preview mode)"""
         try:
             import pandas as pd
-            df = pd.read_csv(file_path)
+            df = pd.read_csv(self._rewind(source), nrows=options.max_rows if options.preview else None)
             markdown = df.to_markdown(index=False)
             return MarkItDownResult(markdown)
         except Exception as e:
             return MarkItDownResult(f"Error converting CSV: {str(e)}")
     
-    def _convert_json(self, file_path):
+    def _convert_json(self, source):
         """Convert JSON to markdown"""
         try:
             import json
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = json.loads(self._read_text(source))
             
             markdown = "# JSON Data\n\n```json\n" + json.dumps(data, indent=2) + "\n```"
             return MarkItDownResult(markdown)
         except Exception as e:
             return MarkItDownResult(f"Error converting JSON: {str(e)}")
     
-    def _convert_xml(self, file_path):
+    def _convert_xml(self, source):
         """Convert XML using lxml"""
         try:
             from lxml import etree
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = self._read_text(source)
             
             # Pretty print XML
             root = etree.fromstring(content.encode())
@@ -374,13 +1576,50 @@ class MarkItDown:
         except Exception as e:
             return MarkItDownResult(f"Error converting XML: {str(e)}")
     
-    def _convert_image(self, file_path):
-        """Convert image using EasyOCR (optimized for Synology NAS)"""
+    def _convert_image(self, source, ocr_mode='balanced', load_reader=None):
+        """Convert image through the shared OCR service when OCR_SERVICE_SOCKET is
+        set, falling back to in-process OCR only if the service is not running (a
+        busy service raises AdmissionRejected, answered with 503 like other load
+        shedding, so workers never load models of their own under load).
+        load_reader(model_dir) replaces _load_ocr_reader for in-process OCR."""
+        started = time.time()
+        try:
+            if OCR_SERVICE_SOCKET:
+                try:
+                    client = OCRServiceClient(OCR_SERVICE_SOCKET, OCR_SERVICE_TIMEOUT)
+                    text = client.ocr(self._read_bytes(source), ocr_mode, self._source_name(source))
+                    return MarkItDownResult(text)
+                except OCRServiceUnavailable as e:
+                    logger.warning(f"OCR service unavailable ({str(e)}), using in-process OCR")
+                except OCRServiceError as e:
+                    logger.error(f"OCR service failed for {self._source_name(source)}: {str(e)}")
+                    return MarkItDownResult(f"Error converting image: {str(e)}")
+            return self._convert_image_local(source, ocr_mode, load_reader)
+        finally:
+            record_ocr_latency(ocr_mode, time.time() - started)
+    
+    def _load_ocr_reader(self, model_dir):
+        if self._ocr_reader is not None:
+            return self._ocr_reader
+        import easyocr
+        reader = easyocr.Reader(['en'], gpu=False, verbose=True, 
+                                model_storage_directory=model_dir)
+        if self.keep_ocr_models:
+            self._ocr_reader = reader
+        return reader
+    
+    def _convert_image_local(self, source, ocr_mode='balanced', load_reader=None):
+        """Convert image using EasyOCR (optimized for Synology NAS).
+        
+        ocr_mode 'fast' runs a detection pre-check and a single recognition pass,
+        'balanced' retries with more sensitive parameters until text is found, and
+        'accurate' runs every parameter set and merges the regions found.
+        """
         try:
             import os
             import tempfile
             
-            filename = os.path.basename(file_path)
+            filename = self._source_name(source)
             logger.info(f"Processing image: {filename}")
             
             # Set up environment for EasyOCR
@@ -396,10 +1635,11 @@ class MarkItDown:
                 os.makedirs(easyocr_model_dir, exist_ok=True)
                 logger.info(f"Using EasyOCR model directory: {easyocr_model_dir}")
                 
+                # Decode once, normalise and bound the pixels handed to each readtext call
+                frames = self._prepare_ocr_frames(source)
+                
                 # Import and initialize EasyOCR
-                import easyocr
-                reader = easyocr.Reader(['en'], gpu=False, verbose=True, 
-                                      model_storage_directory=easyocr_model_dir)
+                reader = (load_reader or self._load_ocr_reader)(easyocr_model_dir)
                 
                 # Try multiple parameter combinations for better results
                 parameter_sets = [
@@ -408,23 +1648,29 @@ class MarkItDown:
                     {'detail': 1, 'paragraph': False, 'width_ths': 0.5, 'height_ths': 0.5},  # Very sensitive
                 ]
                 
+                logger.info(f"OCR mode: {ocr_mode}")
                 best_results = []
-                for i, params in enumerate(parameter_sets):
-                    try:
-                        logger.info(f"EasyOCR attempt {i+1}/3 with params: {params}")
-                        results = reader.readtext(file_path, **params)
-                        logger.info(f"EasyOCR attempt {i+1} found {len(results)} text regions")
-                        
-                        if len(results) > len(best_results):
-                            best_results = results
-                            logger.info(f"New best result set with {len(results)} regions")
-                        
-                        if results:  # If we found something, break early
-                            break
+                if ocr_mode == 'fast':
+                    best_results = self._ocr_fast(reader, frames)
+                elif ocr_mode == 'accurate':
+                    best_results = self._ocr_accurate(reader, frames, parameter_sets)
+                else:
+                    for i, params in enumerate(parameter_sets):
+                        try:
+                            logger.info(f"EasyOCR attempt {i+1}/3 with params: {params}")
+                            results = self._readtext_frames(reader, frames, params)
+                            logger.info(f"EasyOCR attempt {i+1} found {len(results)} text regions")
                             
-                    except Exception as e:
-                        logger.warning(f"EasyOCR attempt {i+1} failed: {str(e)}")
-                        continue
+                            if len(results) > len(best_results):
+                                best_results = results
+                                logger.info(f"New best result set with {len(results)} regions")
+                            
+                            if results:  # If we found something, break early
+                                break
+                                
+                        except Exception as e:
+                            logger.warning(f"EasyOCR attempt {i+1} failed: {str(e)}")
+                            continue
                 
                 if best_results:
                     extracted_texts = []
@@ -501,11 +1747,224 @@ class MarkItDown:
             logger.error(f"Image conversion failed: {str(e)}")
             return MarkItDownResult(f"Error converting image: {str(e)}")
     
-    def _convert_markdown(self, file_path):
-        """Read existing markdown file"""
+    def _prepare_ocr_frames(self, source):
+        """Decode an image once into OCR-ready frames, each a list of (tile, x, y).
+        
+        EXIF orientation is applied, multi-frame GIF/TIFF images are split into
+        frames (up to OCR_MAX_FRAMES), and everything is converted to grayscale.
+        Frames are downscaled so their text lines are about OCR_TARGET_TEXT_HEIGHT
+        pixels high (see _ocr_scale), and only further when they would still be
+        above OCR_MAX_TOTAL_PIXELS; frames whose text would become illegible in
+        EasyOCR's detection canvas are cut into overlapping tiles (see
+        _tile_image). An image yields at most OCR_MAX_TILES tiles' worth of pixels
+        (OCR_TILE_SIZE squared each) in all, shared out between its frames: a
+        frame that would need more than its share is shrunk until it fits. This
+        bounds the work per readtext call and per image (at most three readtext
+        passes over those pixels) regardless of the original resolution.
+        """
+        started = time.time()
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            from PIL import Image, ImageOps, ImageSequence
+            import numpy as np
+            
+            frames = []
+            tile_budget = OCR_MAX_TILES
+            with self._open_binary(source) as f:
+                with Image.open(f) as image:
+                    original_size = image.size
+                    frame_count = min(getattr(image, 'n_frames', 1), OCR_MAX_FRAMES, OCR_MAX_TILES)
+                    if getattr(image, 'n_frames', 1) > frame_count:
+                        logger.warning(f"Only the first {frame_count} frames will be processed")
+                    for index, frame in enumerate(ImageSequence.Iterator(image)):
+                        if index >= frame_count:
+                            break
+                        frame = ImageOps.exif_transpose(frame).convert('L')
+                        # Frames left to process get at least an even share of the tiles left
+                        frame_budget = tile_budget // (frame_count - index)
+                        
+                        array = np.asarray(frame)
+                        scale, text_height = self._ocr_scale(array)
+                        while True:
+                            if scale < 1.0:
+                                new_size = (max(1, round(frame.width * scale)), max(1, round(frame.height * scale)))
+                                array = np.asarray(frame.resize(new_size, Image.LANCZOS))
+                            tiles = self._tile_image(array, text_height and text_height * scale)
+                            cost = sum(-(-tile.size // OCR_TILE_SIZE ** 2) for tile, _, _ in tiles)
+                            if cost <= frame_budget:
+                                break
+                            # Over the tile budget: trade legibility for a bounded OCR time
+                            logger.warning(f"Frame {index + 1} needs {cost} tiles, "
+                                           f"{frame_budget} allowed: downscaling further")
+                            scale *= min(0.9, (frame_budget / cost) ** 0.5)
+                        tile_budget -= cost
+                        frames.append(tiles)
+            
+            tiles = sum(len(frame) for frame in frames)
+            logger.info(f"OCR preprocessing: {original_size[0]}x{original_size[1]} -> {len(frames)} frame(s), "
+                        f"{tiles} tile(s) in {time.time() - started:.2f}s")
+            return frames
+        except Exception as e:
+            # Let EasyOCR decode the original as before
+            logger.warning(f"Image preprocessing failed, using original image: {str(e)}")
+            image_input = source if isinstance(source, (str, os.PathLike)) else self._read_bytes(source)
+            return [[(image_input, 0, 0)]]
+    
+    def _ocr_scale(self, array):
+        """Downscale factor and estimated text height (or None) for a grayscale
+        frame. With a text height estimate the
+        lines are brought to OCR_TARGET_TEXT_HEIGHT (never enlarged); without one,
+        frames above OCR_MAX_PIXELS shrink by at most OCR_MIN_SCALE and never below
+        OCR_TILE_SIZE on their short side, so narrow scans (receipts) keep their
+        resolution and are tiled instead. OCR_MAX_TOTAL_PIXELS caps both."""
+        height, width = array.shape[:2]
+        pixels = width * height
+        text_height = self._estimate_text_height(array)
+        if text_height is not None:
+            scale = min(1.0, OCR_TARGET_TEXT_HEIGHT / text_height)
+        elif pixels > OCR_MAX_PIXELS:
+            scale = max(OCR_MIN_SCALE, (OCR_MAX_PIXELS / pixels) ** 0.5, min(1.0, OCR_TILE_SIZE / min(width, height)))
+        else:
+            scale = 1.0
+        scale = min(scale, (OCR_MAX_TOTAL_PIXELS / pixels) ** 0.5)
+        logger.info(f"OCR scale {scale:.2f} for {width}x{height} "
+                    f"(text height {'unknown' if text_height is None else f'{text_height:.0f}px'})")
+        return scale, text_height
+    
+    def _estimate_text_height(self, array):
+        """Median height in pixels of the text lines in a grayscale frame, from the
+        rows holding ink (Otsu threshold, dark or light text); None when fewer than
+        OCR_MIN_TEXT_LINES lines stand out, e.g. in photos without clear text rows"""
+        import numpy as np
+        
+        histogram = np.bincount(array.ravel(), minlength=256).astype(np.float64)
+        levels = np.arange(256)
+        weight = np.cumsum(histogram)
+        total = weight[-1]
+        cumulative_mean = np.cumsum(histogram * levels)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            between = (cumulative_mean[-1] * weight - cumulative_mean * total) ** 2 / (weight * (total - weight))
+        if np.isnan(between).all():
+            return None  # A single grey level: nothing to separate
+        threshold = int(np.nanargmax(between))
+        ink = array <= threshold
+        if ink.mean() > 0.5:
+            ink = ~ink  # Light text on a dark background
+        
+        row_ink = ink.mean(axis=1)
+        text_rows = row_ink > max(0.002, 0.5 * row_ink.mean())
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], text_rows.view(np.int8), [0]))))
+        line_heights = edges[1::2] - edges[::2]
+        line_heights = line_heights[line_heights >= 3]  # Specks and rules are not lines
+        if len(line_heights) < OCR_MIN_TEXT_LINES:
+            return None
+        return float(np.median(line_heights))
+    
+    def _tile_image(self, array, text_height=None):
+        """Split a frame into overlapping OCR_TILE_SIZE tiles if it needs it. EasyOCR
+        detects text on a copy shrunk to OCR_DETECTION_CANVAS and recognizes it at
+        full resolution, so with a known text height only frames whose text would
+        shrink below OCR_MIN_TEXT_HEIGHT there are tiled; without one, frames above
+        OCR_MAX_PIXELS are. Tiles cut lines of text, so fewer is more accurate."""
+        height, width = array.shape[:2]
+        if text_height is not None:
+            if text_height * min(1.0, OCR_DETECTION_CANVAS / max(width, height)) >= OCR_MIN_TEXT_HEIGHT:
+                return [(array, 0, 0)]
+        elif height * width <= OCR_MAX_PIXELS:
+            return [(array, 0, 0)]
+        
+        step = OCR_TILE_SIZE - OCR_TILE_OVERLAP
+        tiles = []
+        for y in range(0, max(height - OCR_TILE_OVERLAP, 1), step):
+            for x in range(0, max(width - OCR_TILE_OVERLAP, 1), step):
+                tiles.append((array[y:y + OCR_TILE_SIZE, x:x + OCR_TILE_SIZE], x, y))
+        return tiles
+    
+    def _ocr_fast(self, reader, frames):
+        """Single pass: detect text regions first and only run recognition where some were found"""
+        results = []
+        for tiles in frames:
+            tile_results = []
+            for tile, x, y in tiles:
+                horizontal_list, free_list = reader.detect(tile)
+                if not horizontal_list[0] and not free_list[0]:
+                    tile_results.append(([], x, y))
+                    continue
+                tile_results.append((reader.recognize(tile, horizontal_list[0], free_list[0],
+                                                      detail=1, paragraph=False), x, y))
+            results.extend(self._merge_tile_results(tile_results))
+        
+        if not results:
+            logger.info("EasyOCR fast mode: no text regions detected, recognition skipped")
+        return results
+    
+    def _ocr_accurate(self, reader, frames, parameter_sets):
+        """Run every parameter set and merge the regions found by each pass, per frame"""
+        results = []
+        for frame_index, tiles in enumerate(frames):
+            passes = []
+            for i, params in enumerate(parameter_sets):
+                try:
+                    pass_results = self._readtext_frames(reader, [tiles], params)
+                    logger.info(f"EasyOCR accurate pass {i+1}/{len(parameter_sets)} (frame {frame_index+1}) "
+                                f"found {len(pass_results)} text regions")
+                    passes.append((pass_results, 0, 0))
+                except Exception as e:
+                    logger.warning(f"EasyOCR accurate pass {i+1} failed: {str(e)}")
+            if passes:
+                results.extend(self._merge_tile_results(passes))
+        return results
+    
+    def _readtext_frames(self, reader, frames, params):
+        """Run readtext over every tile of every frame and merge the results per frame"""
+        results = []
+        for tiles in frames:
+            tile_results = [(reader.readtext(tile, **params), x, y) for tile, x, y in tiles]
+            results.extend(self._merge_tile_results(tile_results))
+        return results
+    
+    def _merge_tile_results(self, tile_results):
+        """Shift tile results into frame coordinates and drop regions detected twice in
+        the overlap between tiles (keeping the larger box, which is the uncut one)"""
+        if len(tile_results) == 1:
+            return tile_results[0][0]
+        
+        def bounds(bbox):
+            xs = [point[0] for point in bbox]
+            ys = [point[1] for point in bbox]
+            return min(xs), min(ys), max(xs), max(ys)
+        
+        def area(box):
+            return max(0, box[2] - box[0]) * max(0, box[3] - box[1])
+        
+        kept = []
+        for results, x, y in tile_results:
+            for bbox, text, confidence in results:
+                bbox = [(point[0] + x, point[1] + y) for point in bbox]
+                box = bounds(bbox)
+                duplicate_of = None
+                for index, (_, _, _, other) in enumerate(kept):
+                    overlap = area((max(box[0], other[0]), max(box[1], other[1]),
+                                    min(box[2], other[2]), min(box[3], other[3])))
+                    if overlap > 0.6 * max(1, min(area(box), area(other))):
+                        duplicate_of = index
+                        break
+                if duplicate_of is None:
+                    kept.append((bbox, text, confidence, box))
+                elif area(box) > area(kept[duplicate_of][3]):
+                    kept[duplicate_of] = (bbox, text, confidence, box)
+        
+        # Back to reading order: top to bottom, then left to right
+        kept.sort(key=lambda region: (region[3][1], region[3][0]))
+        return [(bbox, text, confidence) for bbox, text, confidence, _ in kept]
+    
+    def _convert_markdown(self, source, options):
+        """Read existing markdown file, passing valid UTF-8 through undecoded"""
+        try:
+            if options.max_output_bytes is None:
+                data = self._utf8_passthrough(source)
+                if data is not None:
+                    return MarkItDownResult(data=data)
+            content = self._read_text(source, limit=options.max_output_bytes)
             return MarkItDownResult(content)
         except Exception as e:
             return MarkItDownResult(f"Error reading Markdown: {str(e)}")
@@ -540,27 +1999,902 @@ class MarkItDown:
         except Exception as e:
             return MarkItDownResult(f"Error processing YouTube video: {str(e)}")
 
-# Configure logging
+def _zstandard():
+    """The zstandard module, or None if it is not installed (gzip is still offered)"""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+def available_encodings():
+    """Content-Encodings this server can produce, most preferred first"""
+    return ('zstd', 'gzip') if _zstandard() is not None else ('gzip',)
+
+def compressor(encoding, level):
+    """Incremental compressor (compress()/flush()) for a Content-Encoding"""
+    if encoding == 'gzip':
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return _zstandard().ZstdCompressor(level=level).compressobj()
+
+class CompressingReader:
+    """Binary file object that compresses another stream as it is read, so a
+    response is compressed chunk by chunk while it is being sent"""
+    
+    def __init__(self, stream, encoding, level):
+        self.stream = stream
+        self._compressor = compressor(encoding, level)
+        self._buffer = bytearray()
+        self._finished = False
+    
+    def read(self, size=-1):
+        while not self._finished and (size is None or size < 0 or len(self._buffer) < size):
+            chunk = self.stream.read(COMPRESSION_CHUNK_BYTES)
+            if chunk:
+                self._buffer += self._compressor.compress(chunk)
+            else:
+                self._buffer += self._compressor.flush()
+                self._finished = True
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+    
+    def close(self):
+        self.stream.close()
+
+
+class ResultStore:
+    """Conversion results indexed in SQLite (WAL mode) and shared by all workers.
+
+    Small results are stored inline in the database; larger ones are written once
+    to blobs/<aa>/<sha256> and shared by every result with the same content.
+    Lookups go through the (conversion_id, filename) primary key and purging uses
+    the expires_at/accessed_at indexes, so no directory scans are needed.
+    
+    The variants table holds precompressed copies (gzip, zstd) of each result
+    content, made once in put() so downloads negotiate Content-Encoding without
+    compressing again. They are added after the result row is committed, so a
+    result can be downloaded (compressed on the fly) while they are being made. They are stored inline or as blobs/<aa>/<sha256>.<encoding>
+    by the same size rule, and removed with the last result that uses them.
+    
+    The fragments table caches the markdown of individual container parts
+    (slides, sheets, PDF pages) for incremental reconversion.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            conversion_id TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            mimetype TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            inline_data BLOB,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (conversion_id, filename)
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_expires_at ON results(expires_at);
+        CREATE INDEX IF NOT EXISTS idx_results_accessed_at ON results(accessed_at);
+        CREATE INDEX IF NOT EXISTS idx_results_digest ON results(digest);
+        CREATE TABLE IF NOT EXISTS variants (
+            digest TEXT NOT NULL,
+            encoding TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            inline_data BLOB,
+            PRIMARY KEY (digest, encoding)
+        );
+        CREATE TABLE IF NOT EXISTS fragments (
+            key TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_fragments_accessed_at ON fragments(accessed_at);
+    """
+    
+    def __init__(self, root_dir, max_age_seconds=3600, inline_max_bytes=64 * 1024, compression_levels=None):
+        self.root_dir = root_dir
+        self.blob_dir = os.path.join(root_dir, 'blobs')
+        self.db_path = os.path.join(root_dir, 'results.db')
+        self.max_age_seconds = max_age_seconds
+        self.inline_max_bytes = inline_max_bytes
+        self.compression_levels = compression_levels or {}  # {encoding: level} of the stored variants
+        self._local = threading.local()
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._connection().executescript(self.SCHEMA)
+    
+    def _connection(self):
+        """One connection per thread, reopened after fork()"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+    
+    def _variant_path(self, digest, encoding):
+        return f"{self._blob_path(digest)}.{encoding}"
+    
+    def _remove_files_if_unreferenced(self, conn, digest):
+        # Caller holds the write lock, so no put() can add a reference meanwhile.
+        # Variants go with the last result of that content, the blob with the last external one.
+        if not conn.execute('SELECT 1 FROM results WHERE digest = ? LIMIT 1', (digest,)).fetchone():
+            for variant in conn.execute('SELECT encoding FROM variants WHERE digest = ? AND inline_data IS NULL',
+                                        (digest,)).fetchall():
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._variant_path(digest, variant['encoding']))
+            conn.execute('DELETE FROM variants WHERE digest = ?', (digest,))
+        if conn.execute('SELECT 1 FROM results WHERE digest = ? AND inline_data IS NULL LIMIT 1', (digest,)).fetchone():
+            return
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+    
+    def _compress_variants(self, digest, data, mimetype):
+        """Compress data for each configured encoding not yet stored for digest, outside
+        any transaction; returns [(encoding, size, inline_data, tmp_path)]"""
+        if len(data) < COMPRESSION_MIN_BYTES or mimetype in COMPRESSED_MIMETYPES:
+            return []
+        stored = {row['encoding'] for row in self._connection().execute(
+            'SELECT encoding FROM variants WHERE digest = ?', (digest,))}
+        variants = []
+        for encoding, level in self.compression_levels.items():
+            if encoding in stored or encoding not in available_encodings():
+                continue
+            path = self._variant_path(digest, encoding)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            compress = compressor(encoding, level)
+            with open(tmp_path, 'wb') as f, memoryview(data) as view:
+                for start in range(0, len(view), COMPRESSION_CHUNK_BYTES):
+                    f.write(compress.compress(view[start:start + COMPRESSION_CHUNK_BYTES]))
+                f.write(compress.flush())
+                size = f.tell()
+            if size >= len(data):
+                os.remove(tmp_path)  # Incompressible; served as it is
+                continue
+            inline_data = None
+            if size <= self.inline_max_bytes:
+                with open(tmp_path, 'rb') as f:
+                    inline_data = f.read()
+                os.remove(tmp_path)
+                tmp_path = None
+            variants.append((encoding, size, inline_data, tmp_path))
+        return variants
+    
+    def put(self, conversion_id, filename, data, mimetype='text/markdown'):
+        """Store a result; data is bytes or another buffer (e.g. an mmap)"""
+        digest = hashlib.sha256(data).hexdigest()
+        now = time.time()
+        inline_data = bytes(data) if len(data) <= self.inline_max_bytes else None
+        blob_path = self._blob_path(digest)
+        tmp_path = None
+        
+        # Write the blob outside the transaction; it is only renamed into place under the lock
+        if inline_data is None and not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+        
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            previous = conn.execute('SELECT digest FROM results WHERE conversion_id = ? AND filename = ?',
+                                    (conversion_id, filename)).fetchone()
+            conn.execute(
+                'INSERT OR REPLACE INTO results (conversion_id, filename, mimetype, size, digest, inline_data, '
+                'created_at, accessed_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (conversion_id, filename, mimetype, len(data), digest, inline_data,
+                 now, now, now + self.max_age_seconds)
+            )
+            if inline_data is None and not os.path.exists(blob_path):
+                if tmp_path:
+                    os.replace(tmp_path, blob_path)
+                    tmp_path = None
+                else:
+                    # Purged between our existence check and taking the lock
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    with open(blob_path, 'wb') as f:
+                        f.write(data)
+            if previous and previous['digest'] != digest:
+                self._remove_files_if_unreferenced(conn, previous['digest'])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        # The result is downloadable from here on; its precompressed copies follow
+        try:
+            self._add_variants(digest, data, mimetype)
+        except Exception as e:
+            logger.warning(f"Precompressing result {conversion_id}/{filename} failed: {str(e)}")
+    
+    def _add_variants(self, digest, data, mimetype):
+        """Compress and store the missing variants of a stored result content. They
+        are dropped if every result with that content was removed meanwhile."""
+        variants = self._compress_variants(digest, data, mimetype)
+        if not variants:
+            return
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            if conn.execute('SELECT 1 FROM results WHERE digest = ? LIMIT 1', (digest,)).fetchone():
+                for encoding, size, variant_data, variant_tmp_path in variants:
+                    inserted = conn.execute('INSERT OR IGNORE INTO variants (digest, encoding, size, inline_data) '
+                                            'VALUES (?, ?, ?, ?)', (digest, encoding, size, variant_data)).rowcount
+                    if inserted and variant_tmp_path:
+                        os.replace(variant_tmp_path, self._variant_path(digest, encoding))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            for path in [variant[3] for variant in variants]:
+                if path and os.path.exists(path):
+                    os.remove(path)
+    
+    def get(self, conversion_id, filename):
+        """Look up a live result and mark it as recently used; returns a row or None"""
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute(
+            'SELECT conversion_id, filename, mimetype, size, digest, inline_data FROM results '
+            'WHERE conversion_id = ? AND filename = ? AND expires_at >= ?',
+            (conversion_id, filename, now)
+        ).fetchone()
+        if row is not None:
+            conn.execute('UPDATE results SET accessed_at = ?, expires_at = ? WHERE conversion_id = ? AND filename = ?',
+                         (now, now + self.max_age_seconds, conversion_id, filename))
+        return row
+    
+    def open(self, row):
+        """Return a binary file object with the content of a result row"""
+        if row['inline_data'] is not None:
+            return io.BytesIO(row['inline_data'])
+        return open(self._blob_path(row['digest']), 'rb')
+    
+    def open_variant(self, row, encodings):
+        """Return (encoding, binary file object, size) for the first of encodings
+        stored precompressed for a result row, or None"""
+        stored = {variant['encoding']: variant for variant in self._connection().execute(
+            'SELECT encoding, size, inline_data FROM variants WHERE digest = ?', (row['digest'],))}
+        for encoding in encodings:
+            variant = stored.get(encoding)
+            if variant is None:
+                continue
+            if variant['inline_data'] is not None:
+                return encoding, io.BytesIO(variant['inline_data']), variant['size']
+            try:
+                return encoding, open(self._variant_path(row['digest'], encoding), 'rb'), variant['size']
+            except FileNotFoundError:
+                continue
+        return None
+    
+    def purge(self, quota_bytes, min_evict_age_seconds=0):
+        """Delete expired results, then least-recently-used ones until under quota_bytes"""
+        now = time.time()
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            expired = conn.execute('SELECT digest, size FROM results '
+                                   'WHERE expires_at < ?', (now,)).fetchall()
+            conn.execute('DELETE FROM results WHERE expires_at < ?', (now,))
+            # Precompressed variants count towards the quota too
+            bytes_in_use = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            bytes_in_use += conn.execute('SELECT COALESCE(SUM(size), 0) FROM variants '
+                                         'WHERE digest IN (SELECT digest FROM results)').fetchone()[0]
+            
+            evicted = []
+            if bytes_in_use > quota_bytes:
+                candidates = conn.execute(
+                    'SELECT rowid, digest, size, '
+                    '(SELECT COALESCE(SUM(size), 0) FROM variants WHERE variants.digest = results.digest) AS variant_size '
+                    'FROM results WHERE accessed_at < ? ORDER BY accessed_at', (now - min_evict_age_seconds,)
+                )
+                variants_counted = set()  # Variants are shared by every result with the same content
+                for row in candidates:
+                    if bytes_in_use <= quota_bytes:
+                        break
+                    evicted.append(row)
+                    bytes_in_use -= row['size']
+                    if row['digest'] not in variants_counted:
+                        variants_counted.add(row['digest'])
+                        bytes_in_use -= row['variant_size']
+                conn.executemany('DELETE FROM results WHERE rowid = ?', [(row['rowid'],) for row in evicted])
+            
+            for digest in {row['digest'] for row in expired + evicted}:
+                self._remove_files_if_unreferenced(conn, digest)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        
+        return {
+            'results_expired': len(expired),
+            'results_evicted': len(evicted),
+            'bytes_reclaimed': sum(row['size'] for row in expired + evicted),
+            'bytes_in_use': bytes_in_use
+        }
+    
+    def get_fragments(self, keys):
+        """Return {key: markdown} for the cached fragments among keys and mark them as used"""
+        conn = self._connection()
+        fragments = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):  # Stay below SQLite's bound parameter limit
+            chunk = keys[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            for row in conn.execute(f'SELECT key, content FROM fragments WHERE key IN ({placeholders})', chunk):
+                fragments[row['key']] = row['content']
+        if fragments:
+            conn.executemany('UPDATE fragments SET accessed_at = ? WHERE key = ?',
+                             [(time.time(), key) for key in fragments])
+        return fragments
+    
+    def put_fragments(self, fragments):
+        """Cache {key: markdown} fragments"""
+        now = time.time()
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('INSERT OR REPLACE INTO fragments (key, content, size, accessed_at) VALUES (?, ?, ?, ?)',
+                             [(key, content, len(content), now) for key, content in fragments.items()])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def purge_fragments(self, max_age_seconds, quota_bytes):
+        """Delete fragments unused for max_age_seconds, then least-recently-used ones until under quota_bytes"""
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            expired = conn.execute('DELETE FROM fragments WHERE accessed_at < ?',
+                                   (time.time() - max_age_seconds,)).rowcount
+            bytes_in_use = conn.execute('SELECT COALESCE(SUM(size), 0) FROM fragments').fetchone()[0]
+            evicted = []
+            if bytes_in_use > quota_bytes:
+                for row in conn.execute('SELECT key, size FROM fragments ORDER BY accessed_at'):
+                    if bytes_in_use <= quota_bytes:
+                        break
+                    evicted.append((row['key'],))
+                    bytes_in_use -= row['size']
+                conn.executemany('DELETE FROM fragments WHERE key = ?', evicted)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return {'fragments_removed': expired + len(evicted), 'fragment_bytes_in_use': bytes_in_use}
+
+class OCRServiceError(Exception):
+    """The OCR service rejected or failed a job"""
+
+
+class OCRServiceUnavailable(OCRServiceError):
+    """Nothing is listening on the OCR service socket"""
+
+
+def _send_message(sock, header, payload=b''):
+    """Frame: 4-byte header length, JSON header (with payload size), payload"""
+    header = dict(header, size=len(payload))
+    header_bytes = json.dumps(header).encode('utf-8')
+    sock.sendall(struct.pack('>I', len(header_bytes)) + header_bytes + payload)
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("OCR service connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def _recv_message(sock):
+    # Sizes come from the peer, so they are checked before anything is read
+    header_size = struct.unpack('>I', _recv_exact(sock, 4))[0]
+    if header_size > OCR_SERVICE_MAX_HEADER_BYTES:
+        raise ValueError(f"OCR service message header too large: {header_size} bytes")
+    header = json.loads(_recv_exact(sock, header_size))
+    size = header.get('size')
+    if not isinstance(size, int) or not 0 <= size <= MAX_FILE_SIZE:
+        raise ValueError(f"Invalid OCR service payload size: {size!r}")
+    return header, _recv_exact(sock, size)
+
+
+class OCRServiceClient:
+    """Sends one image to the OCR service over its Unix socket"""
+    
+    def __init__(self, socket_path, timeout):
+        self.socket_path = socket_path
+        self.timeout = timeout
+    
+    def ocr(self, image_bytes, ocr_mode, filename):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError as e:
+                raise OCRServiceUnavailable(str(e)) from e
+            try:
+                _send_message(sock, {'mode': ocr_mode, 'filename': filename,
+                                     'deadline': time.time() + self.timeout}, image_bytes)
+                header, payload = _recv_message(sock)
+            except (OSError, ValueError) as e:
+                raise OCRServiceError(f"OCR service did not answer: {str(e)}") from e
+        if header.get('status') == 'busy':
+            raise AdmissionRejected('OCR', header.get('retry_after', 1))
+        if header.get('status') != 'ok':
+            raise OCRServiceError(header.get('error', header.get('status', 'unknown error')))
+        return payload.decode('utf-8')
+
+
+class BatchingOCRReader:
+    """easyocr.Reader stand-in shared by the OCR service's job threads.
+    
+    readtext() and detect() calls made by concurrent jobs with the same
+    parameters are collected for up to batch_wait seconds and run as one
+    micro-batch on a single thread that owns the model: EasyOCR runs the
+    detector over a batch of images at once (readtext_batched), provided they
+    have the same size, so each image is padded with its background colour at
+    the bottom and right, which leaves box coordinates unchanged. Images are
+    only batched while the padded size fits OCR_DETECTION_CANVAS, so that the
+    padding never makes the detector shrink them. recognize() runs directly,
+    under the same model lock.
+    """
+    
+    def __init__(self, reader, batch_size, batch_wait):
+        self.reader = reader
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.lock = threading.Lock()
+        self.calls = queue.Queue()
+        threading.Thread(target=self._batch_loop, name='markitdown-ocr-batch', daemon=True).start()
+    
+    def readtext(self, image, **params):
+        return self._submit('readtext', image, params)
+    
+    def detect(self, image, **params):
+        return self._submit('detect', image, params)
+    
+    def recognize(self, *args, **kwargs):
+        with self.lock:
+            return self.reader.recognize(*args, **kwargs)
+    
+    def _submit(self, method, image, params):
+        call = {'key': (method, tuple(sorted(params.items()))), 'image': image,
+                'done': threading.Event(), 'result': None, 'error': None}
+        self.calls.put(call)
+        call['done'].wait()
+        if call['error'] is not None:
+            raise call['error']
+        return call['result']
+    
+    def _batch_loop(self):
+        backlog = []
+        while True:
+            if not backlog:
+                backlog.append(self.calls.get())
+            deadline = time.time() + self.batch_wait
+            while len(backlog) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    backlog.append(self.calls.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            batch = self._take_batch(backlog)
+            try:
+                with self.lock:
+                    results = self._run_batch(batch)
+                for call, result in zip(batch, results):
+                    call['result'] = result
+            except Exception as e:
+                for call in batch:
+                    call['error'] = e
+            finally:
+                for call in batch:
+                    call['done'].set()
+    
+    def _take_batch(self, backlog):
+        """Remove and return the oldest call and the calls that can run with it"""
+        first = backlog.pop(0)
+        batch = [first]
+        if not self._batchable(first['image']):
+            return batch
+        height, width = first['image'].shape
+        for call in list(backlog):
+            if len(batch) >= self.batch_size:
+                break
+            if call['key'] != first['key'] or not self._batchable(call['image']):
+                continue
+            padded = (max(height, call['image'].shape[0]), max(width, call['image'].shape[1]))
+            if max(padded) > OCR_DETECTION_CANVAS:
+                continue
+            height, width = padded
+            batch.append(call)
+            backlog.remove(call)
+        return batch
+    
+    def _batchable(self, image):
+        import numpy as np
+        return isinstance(image, np.ndarray) and image.ndim == 2
+    
+    def _run_batch(self, batch):
+        method, params = batch[0]['key'][0], dict(batch[0]['key'][1])
+        if len(batch) == 1:
+            return [getattr(self.reader, method)(batch[0]['image'], **params)]
+        
+        import numpy as np
+        height = max(call['image'].shape[0] for call in batch)
+        width = max(call['image'].shape[1] for call in batch)
+        images = [np.pad(image, ((0, height - image.shape[0]), (0, width - image.shape[1])),
+                         constant_values=int(np.median(image)))
+                  for image in (call['image'] for call in batch)]
+        logger.info(f"OCR service {method} batch of {len(batch)} images, padded to {width}x{height}")
+        if method == 'readtext':
+            return self.reader.readtext_batched(images, **params)
+        from easyocr.utils import reformat_input_batched
+        batch_images, _ = reformat_input_batched(images)
+        horizontal_lists, free_lists = self.reader.detect(batch_images, reformat=False, **params)
+        # Shaped like the result of detect() on a single image
+        return [([horizontal_list], [free_list]) for horizontal_list, free_list in zip(horizontal_lists, free_lists)]
+
+
+class OCRService:
+    """Local OCR sidecar holding one set of EasyOCR models for every web worker.
+    
+    Connections are handled on their own threads and queue jobs in a bounded
+    queue (a full queue answers 'busy' immediately, with a Retry-After
+    estimate, and the worker answers 503). batch_size job threads preprocess
+    and OCR the queued images concurrently through one BatchingOCRReader, so
+    their detection passes run as micro-batches on the shared model. Jobs
+    whose client deadline has passed are dropped without running OCR.
+    """
+    
+    def __init__(self, socket_path, queue_size=16, batch_size=4, batch_wait=0.01):
+        self.socket_path = socket_path
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.converter = MarkItDown(keep_ocr_models=True)
+        self.reader = None
+        self.reader_lock = threading.Lock()
+    
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        server.listen(64)
+        for i in range(self.batch_size):
+            threading.Thread(target=self._ocr_loop, name=f'markitdown-ocr-{i + 1}', daemon=True).start()
+        logger.info(f"OCR service listening on {self.socket_path}")
+        
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+    
+    def _handle(self, conn):
+        with conn:
+            try:
+                header, payload = _recv_message(conn)
+                job = {'header': header, 'payload': payload, 'done': threading.Event(), 'response': None}
+                try:
+                    self.jobs.put_nowait(job)
+                except queue.Full:
+                    _send_message(conn, {'status': 'busy', 'retry_after': self._retry_after()})
+                    return
+                job['done'].wait()
+                response_header, response_payload = job['response']
+                _send_message(conn, response_header, response_payload)
+            except Exception as e:
+                logger.warning(f"OCR service connection failed: {str(e)}")
+    
+    def _retry_after(self):
+        """Seconds until the queue should have room, from the average OCR time"""
+        stats = ocr_latency_stats().values()
+        count = sum(mode['count'] for mode in stats)
+        average = sum(mode['avg_seconds'] * mode['count'] for mode in stats) / count if count else 1
+        return max(1, int(average * (self.jobs.qsize() + 1) / self.batch_size + 0.999))
+    
+    def _load_reader(self, model_dir):
+        with self.reader_lock:
+            if self.reader is None:
+                self.reader = BatchingOCRReader(self.converter._load_ocr_reader(model_dir),
+                                                self.batch_size, self.batch_wait)
+            return self.reader
+    
+    def _ocr_loop(self):
+        while True:
+            job = self.jobs.get()
+            header = job['header']
+            try:
+                if time.time() > header.get('deadline', float('inf')):
+                    job['response'] = ({'status': 'error', 'error': 'deadline exceeded'}, b'')
+                    continue
+                ocr_mode = header.get('mode') if header.get('mode') in OCR_MODES else OCR_DEFAULT_MODE
+                image = io.BytesIO(job['payload'])
+                if header.get('filename'):
+                    image.name = header['filename']
+                logger.info(f"OCR service job ({ocr_mode}), {self.jobs.qsize()} queued")
+                started = time.time()
+                result = self.converter._convert_image_local(image, ocr_mode, self._load_reader)
+                record_ocr_latency(ocr_mode, time.time() - started)
+                job['response'] = ({'status': 'ok'}, result.text_content.encode('utf-8'))
+            except Exception as e:
+                job['response'] = ({'status': 'error', 'error': str(e)}, b'')
+            finally:
+                job['done'].set()
+
+
+class AdmissionRejected(Exception):
+    """A cost class is saturated; the client should retry after retry_after seconds"""
+    
+    def __init__(self, cost_class, retry_after):
+        super().__init__(f"Server busy with {cost_class} conversions, retry in {retry_after}s")
+        self.cost_class = cost_class
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Per-cost-class admission control for conversions (per worker process).
+    
+    Each class has its own concurrency limit and a bounded wait queue, so a burst
+    of expensive jobs (OCR, huge PDFs) can only occupy its own slots while cheap
+    conversions keep flowing. A request that finds the queue full, or that waits
+    longer than max_wait_seconds, is rejected with AdmissionRejected instead of
+    tying up a worker thread.
+    """
+    
+    def __init__(self, limits, max_wait_seconds):
+        """limits: {cost class: (concurrent conversions, waiting requests)}"""
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        self._classes = {
+            name: {'limit': limit, 'queue_limit': queue_limit, 'active': 0, 'waiting': 0,
+                   'admitted': 0, 'shed': 0, 'avg_seconds': 0.0,
+                   'condition': threading.Condition(self._lock)}
+            for name, (limit, queue_limit) in limits.items()
+        }
+    
+    def _retry_after(self, state):
+        """Seconds until a slot should free up, from the class's average conversion time"""
+        backlog = (state['waiting'] + 1) / state['limit']
+        return max(1, int(state['avg_seconds'] * backlog + 0.999))
+    
+    @contextlib.contextmanager
+    def admit(self, cost_class):
+        state = self._classes[cost_class]
+        with self._lock:
+            if state['active'] >= state['limit']:
+                if state['waiting'] >= state['queue_limit']:
+                    state['shed'] += 1
+                    raise AdmissionRejected(cost_class, self._retry_after(state))
+                state['waiting'] += 1
+                try:
+                    deadline = time.monotonic() + self.max_wait_seconds
+                    while state['active'] >= state['limit']:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            state['shed'] += 1
+                            raise AdmissionRejected(cost_class, self._retry_after(state))
+                        state['condition'].wait(remaining)
+                finally:
+                    state['waiting'] -= 1
+            state['active'] += 1
+            state['admitted'] += 1
+        
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                state['active'] -= 1
+                if state['avg_seconds']:
+                    state['avg_seconds'] += (elapsed - state['avg_seconds']) * 0.2  # Moving average
+                else:
+                    state['avg_seconds'] = elapsed
+                state['condition'].notify()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                name: {key: round(value, 3) if isinstance(value, float) else value
+                       for key, value in state.items() if key != 'condition'}
+                for name, state in self._classes.items()
+            }
+
+class BulkManifest:
+    """SQLite record of a bulk conversion run, one row per source file.
+    
+    Holds the size, mtime and SHA-256 seen when each file was last converted, plus
+    its status and output path, so an interrupted or repeated run only converts
+    new, changed and previously failed files. Written only by the parent process;
+    rows are committed in batches.
+    """
+    
+    def __init__(self, path, commit_every=200):
+        self.path = path
+        self.commit_every = commit_every
+        self._pending = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                sha256 TEXT,
+                status TEXT NOT NULL,
+                output TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+    
+    def entries(self):
+        """{path: (size, mtime, sha256, status)} for every recorded file"""
+        return {row[0]: row[1:] for row in self._conn.execute('SELECT path, size, mtime, sha256, status FROM files')}
+    
+    def record(self, path, size, mtime, sha256, status, output=None, error=None):
+        self._conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                           (path, size, mtime, sha256, status, output, error, time.time()))
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+    
+    def commit(self):
+        self._conn.commit()
+        self._pending = 0
+    
+    def close(self):
+        self.commit()
+        self._conn.close()
+
+
+# Configure logging (next to app.py, so the CLI modes work from any directory)
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+os.makedirs(LOG_DIR, exist_ok=True)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler("logs/markitdown.log"),
+        logging.FileHandler(os.path.join(LOG_DIR, 'markitdown.log')),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
+def upload_signature_matches(extension, head):
+    """True if the first bytes of an upload are plausible for its extension"""
+    if extension == 'pdf':
+        return b'%PDF-' in head[:1024]  # Readers tolerate junk before the header
+    if extension == 'webp':
+        return head[:4] == b'RIFF' and head[8:12] == b'WEBP'
+    if extension in TEXT_UPLOAD_EXTENSIONS:
+        return b'\x00' not in head or head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE))
+    signatures = UPLOAD_SIGNATURES.get(extension)
+    return signatures is None or head.startswith(signatures)
+
+
+class IngestedUpload:
+    """Destination of one uploaded file while the multipart body is parsed.
+    
+    Each chunk is written once, straight into a spooled file (memory up to
+    UPLOAD_SPOOL_MAX_BYTES, then TEMP_DIR), and hashed on the way through. The
+    extension is checked before the first byte is stored and the leading bytes as
+    soon as UPLOAD_SNIFF_BYTES have arrived; a file failing either is rejected
+    (rejection says why) and the rest of it is discarded unstored, so the other
+    files of a multi-file upload are still converted. The size is checked on every
+    chunk and an oversized file aborts the request mid-stream.
+    
+    Text uploads are validated as UTF-8 on the way too (is_utf8), so they can be
+    passed through without decoding. Reads and seeks go to the spooled file, so
+    it is used like any stream.
+    """
+    
+    def __init__(self, filename):
+        self.filename = filename
+        self.extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+        self.rejection = None
+        if filename and not allowed_file(filename):
+            self.rejection = f'File type not supported: {filename}'
+        self.max_bytes = UPLOAD_MAX_BYTES.get(self.extension, MAX_FILE_SIZE)
+        self.size = 0
+        self._file = spooled_file()
+        self._hash = hashlib.sha256()
+        self._head = b'' if filename else None  # None once the leading bytes are checked
+        # None: not a passthrough type, or not yet known until the upload is complete
+        self.is_utf8 = None
+        self._utf8 = codecs.getincrementaldecoder('utf-8')() if self.extension in PASSTHROUGH_EXTENSIONS else None
+    
+    def write(self, data):
+        if self.rejection:
+            return len(data)
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f'{self.filename} is too large. Maximum size for .{self.extension} '
+                                        f'files is {self.max_bytes // (1024*1024)}MB')
+        if self._head is not None:
+            self._head += data[:UPLOAD_SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= UPLOAD_SNIFF_BYTES:
+                self._check_signature()
+                if self.rejection:
+                    return len(data)
+        if self._utf8 is not None:
+            try:
+                self._utf8.decode(data)  # Validation only; the text is discarded
+            except UnicodeDecodeError:
+                self._utf8 = None
+                self.is_utf8 = False
+        self._hash.update(data)
+        return self._file.write(data)
+    
+    def _check_signature(self):
+        head, self._head = self._head, None
+        if not upload_signature_matches(self.extension, head):
+            self.rejection = f'{self.filename} does not look like a .{self.extension} file'
+            self._file.seek(0)
+            self._file.truncate()  # Drop what was stored before the check
+    
+    def seek(self, *args):
+        # Werkzeug rewinds each file once it is complete
+        if self._head is not None and not self.rejection:
+            self._check_signature()  # Uploads shorter than UPLOAD_SNIFF_BYTES end here
+        if self._utf8 is not None:
+            try:
+                self._utf8.decode(b'', final=True)
+                self.is_utf8 = True
+            except UnicodeDecodeError:
+                self.is_utf8 = False
+            self._utf8 = None
+        return self._file.seek(*args)
+    
+    @property
+    def spooled(self):
+        return self._file
+    
+    @property
+    def content_hash(self):
+        """SHA-256 of the upload, computed while it was received"""
+        return self._hash.hexdigest()
+    
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class SpooledUploadRequest(Request):
+    """Request whose file uploads are ingested in a single streaming pass (see IngestedUpload)"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return IngestedUpload(filename or '')
+
 app = Flask(__name__)
+app.request_class = SpooledUploadRequest
 
-# Configure session handling
+# Configure session handling (signed cookie holding only the last conversion ID;
+# results themselves live in the result store, so nothing is kept server-side)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-this-in-production')
-app.config['SESSION_TYPE'] = 'filesystem'
-app.config['SESSION_FILE_DIR'] = os.environ.get('SESSION_FILE_DIR', os.path.join(os.getcwd(), 'sessions'))
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=1)
-os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
-os.makedirs('logs', exist_ok=True)
-Session(app)
 
 # Configure upload settings
 UPLOAD_FOLDER = os.environ.get('TMPDIR', os.path.join(os.getcwd(), 'tmp'))
@@ -570,6 +2904,110 @@ os.makedirs(TEMP_DIR, exist_ok=True)
 
 MAX_FILE_SIZE = 250 * 1024 * 1024  # 250MB max file size
 
+# Conversion result store (SQLite index + content-addressed blobs, shared by all workers)
+RESULT_STORE_DIR = os.environ.get('RESULT_STORE_DIR', os.path.join(UPLOAD_FOLDER, 'markitdown_results'))
+RESULT_INLINE_MAX_BYTES = 64 * 1024  # Smaller results are stored inside the database
+FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', '1') != '0'  # Incremental reconversion
+FRAGMENT_CACHE_QUOTA_BYTES = int(os.environ.get('FRAGMENT_CACHE_QUOTA_MB', 256)) * 1024 * 1024
+# Whole converted documents are cached only where reconverting is expensive (OCR), and only
+# when small, so they neither repeat the per-part entries nor crowd them out of the quota
+DOCUMENT_CACHE_EXTENSIONS = {'.pdf', '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp'}
+DOCUMENT_CACHE_MAX_CHARS = 256 * 1024
+PERSIST_RESULTS = os.environ.get('PERSIST_RESULTS', '1') != '0'  # Keep results for /download routes
+
+# Response compression negotiated from Accept-Encoding (zstd needs the zstandard package)
+RESPONSE_COMPRESSION = os.environ.get('RESPONSE_COMPRESSION', '1') != '0'
+COMPRESSION_MIN_BYTES = 1024  # Smaller responses are sent as they are
+COMPRESSED_MIMETYPES = {'application/zip'}  # Sent as they are; compressing again only costs CPU
+COMPRESSION_CHUNK_BYTES = 256 * 1024
+STREAM_COMPRESSION_LEVELS = {'zstd': 3, 'gzip': 6}  # Fresh results, compressed while they are sent
+STORED_COMPRESSION_LEVELS = {  # Stored variants, compressed once in the background
+    'zstd': int(os.environ.get('RESULT_ZSTD_LEVEL', 12)),
+    'gzip': int(os.environ.get('RESULT_GZIP_LEVEL', 9)),
+}
+
+# Uploads and ZIP members up to this size are converted in memory without touching disk
+UPLOAD_SPOOL_MAX_BYTES = int(os.environ.get('UPLOAD_SPOOL_MAX_MB', 8)) * 1024 * 1024
+UPLOAD_SNIFF_BYTES = 4096  # Leading bytes checked against the file type while uploading
+PDF_MAX_BYTES = 125 * 1024 * 1024
+UPLOAD_MAX_BYTES = {'pdf': PDF_MAX_BYTES}  # Per-type limits below MAX_FILE_SIZE
+ZIP_SIGNATURES = (b'PK\x03\x04', b'PK\x05\x06')
+OLE_SIGNATURES = (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',)
+UPLOAD_SIGNATURES = {
+    'docx': ZIP_SIGNATURES, 'xlsx': ZIP_SIGNATURES, 'pptx': ZIP_SIGNATURES, 'zip': ZIP_SIGNATURES,
+    'odt': ZIP_SIGNATURES, 'ods': ZIP_SIGNATURES, 'odp': ZIP_SIGNATURES,
+    # Legacy extensions are also seen on renamed OOXML files
+    'doc': OLE_SIGNATURES + ZIP_SIGNATURES, 'xls': OLE_SIGNATURES + ZIP_SIGNATURES, 'ppt': OLE_SIGNATURES + ZIP_SIGNATURES,
+    'rtf': (b'{\\rtf',),
+    'png': (b'\x89PNG\r\n\x1a\n',), 'jpg': (b'\xff\xd8\xff',), 'jpeg': (b'\xff\xd8\xff',),
+    'gif': (b'GIF87a', b'GIF89a'), 'bmp': (b'BM',), 'tiff': (b'II*\x00', b'MM\x00*'),
+}
+TEXT_UPLOAD_EXTENSIONS = {'txt', 'md', 'markdown', 'csv', 'json', 'xml', 'html', 'htm'}
+PASSTHROUGH_EXTENSIONS = {'txt', 'md', 'markdown'}  # Returned as uploaded when valid UTF-8
+
+# Background janitor for the result store and TEMP_DIR (runs outside request handlers;
+# never in bulk mode, which must not evict the server's results or temp files)
+JANITOR_ENABLED = os.environ.get('JANITOR_ENABLED', '1') != '0' and sys.argv[1:2] != ['--bulk']
+JANITOR_INTERVAL_SECONDS = int(os.environ.get('JANITOR_INTERVAL_SECONDS', 60))
+JANITOR_MIN_EVICT_AGE_SECONDS = 60  # Results younger than this are never evicted for quota
+TEMP_MAX_AGE_SECONDS = int(os.environ.get('TEMP_MAX_AGE_SECONDS', 3600))  # 1 hour
+# Cached parts hold converted document content too, so by default they expire like results
+FRAGMENT_CACHE_MAX_AGE_SECONDS = int(os.environ.get('FRAGMENT_CACHE_MAX_AGE_SECONDS', TEMP_MAX_AGE_SECONDS))
+TEMP_DIR_QUOTA_BYTES = int(os.environ.get('TEMP_DIR_QUOTA_MB', 2048)) * 1024 * 1024
+JANITOR_LOCK_FILE = os.path.join(TEMP_DIR, '.janitor.lock')
+JANITOR_STATS_FILE = os.path.join(TEMP_DIR, '.janitor_stats.json')
+
+# Shared OCR service (optional sidecar: python app.py --ocr-service)
+OCR_SERVICE_SOCKET = os.environ.get('OCR_SERVICE_SOCKET', '')  # Empty: OCR runs in each worker
+OCR_SERVICE_TIMEOUT = int(os.environ.get('OCR_SERVICE_TIMEOUT', 120))
+OCR_SERVICE_QUEUE_SIZE = int(os.environ.get('OCR_SERVICE_QUEUE_SIZE', 16))
+OCR_SERVICE_MAX_HEADER_BYTES = 64 * 1024  # Payloads are limited to MAX_FILE_SIZE
+OCR_SERVICE_BATCH_SIZE = int(os.environ.get('OCR_SERVICE_BATCH_SIZE', 4))  # Jobs OCR'd concurrently, batched on the model
+OCR_SERVICE_BATCH_WAIT = 0.01  # Seconds to wait for more calls to fill a batch
+
+# OCR image preprocessing (bounds per-image OCR time and memory)
+OCR_MAX_PIXELS = int(os.environ.get('OCR_MAX_MEGAPIXELS', 4)) * 1000 * 1000  # Per readtext call, when the text height is unknown
+OCR_MAX_TOTAL_PIXELS = 4 * OCR_MAX_PIXELS  # Per frame, after downscaling
+OCR_MIN_SCALE = 0.5  # Downscale at most this far when the text height is unknown
+OCR_TARGET_TEXT_HEIGHT = int(os.environ.get('OCR_TARGET_TEXT_HEIGHT', 40))  # Pixels per text line after scaling
+OCR_MIN_TEXT_LINES = 3  # Text lines needed to trust a text height estimate
+OCR_DETECTION_CANVAS = 2560  # EasyOCR readtext canvas_size: longest side its detector sees
+OCR_MIN_TEXT_HEIGHT = 10  # Text lines smaller than this in the detection canvas are missed
+OCR_TILE_SIZE = 1600
+OCR_TILE_OVERLAP = 160  # Enough for a line of text cut by a tile edge to appear whole in one tile
+OCR_MAX_FRAMES = 20
+OCR_MAX_TILES = int(os.environ.get('OCR_MAX_TILES', 20))  # Per image, over all its frames, in OCR_TILE_SIZE squares
+
+# Scanned PDF pages (no text layer) are rasterized and OCR'd
+PDF_OCR_ENABLED = os.environ.get('PDF_OCR_ENABLED', '1') != '0'
+PDF_OCR_DPI = int(os.environ.get('PDF_OCR_DPI', 200))
+PDF_OCR_WORKERS = int(os.environ.get('PDF_OCR_WORKERS', 2))
+PDF_MAX_OCR_PAGES = 100
+PDF_OCR_READ_AHEAD = 1  # Rendered pages waiting for a free OCR worker
+
+# OCR speed/accuracy tiers, selectable per request with the 'ocr_mode' form field
+OCR_MODES = ('fast', 'balanced', 'accurate')
+OCR_DEFAULT_MODE = os.environ.get('OCR_MODE', 'balanced')
+if OCR_DEFAULT_MODE not in OCR_MODES:
+    OCR_DEFAULT_MODE = 'balanced'
+
+# Limits applied by the 'preview' form field (see ConversionOptions)
+PREVIEW_PAGES = int(os.environ.get('PREVIEW_PAGES', 3))
+PREVIEW_SLIDES = int(os.environ.get('PREVIEW_SLIDES', 3))
+PREVIEW_ROWS = int(os.environ.get('PREVIEW_ROWS', 20))
+PREVIEW_MAX_BYTES = int(os.environ.get('PREVIEW_MAX_KB', 16)) * 1024
+
+# Admission control: concurrent conversions and waiting requests per cost class and worker
+ADMISSION_LIMITS = {
+    cost_class: (int(os.environ.get(f'ADMISSION_{cost_class.upper()}_CONCURRENCY', limit)),
+                 int(os.environ.get(f'ADMISSION_{cost_class.upper()}_QUEUE', queue_limit)))
+    for cost_class, limit, queue_limit in (('light', 8, 32), ('standard', 4, 8), ('heavy', 2, 2))
+}
+ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get('ADMISSION_MAX_WAIT_SECONDS', 10))
+ADMISSION_HEAVY_BYTES = int(os.environ.get('ADMISSION_HEAVY_MB', 20)) * 1024 * 1024
+LIGHT_EXTENSIONS = {'txt', 'md', 'markdown', 'csv', 'json', 'xml', 'html', 'htm', 'rtf'}
+OCR_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp'}
+
 # Expanded file type support based on available libraries
 ALLOWED_EXTENSIONS = {
     # Office Documents
@@ -589,9 +3027,34 @@ ALLOWED_EXTENSIONS = {
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
+result_store = ResultStore(RESULT_STORE_DIR, max_age_seconds=TEMP_MAX_AGE_SECONDS,
+                           inline_max_bytes=RESULT_INLINE_MAX_BYTES,
+                           compression_levels=STORED_COMPRESSION_LEVELS if RESPONSE_COMPRESSION else None)
+admission = AdmissionController(ADMISSION_LIMITS, ADMISSION_MAX_WAIT_SECONDS)
+
+_persist_executor = None
+_persist_executor_pid = None
+_persist_executor_lock = threading.Lock()
+
+def _log_persist_failure(future):
+    if future.exception() is not None:
+        logger.error(f"Error saving conversion result: {str(future.exception())}")
+
+def submit_background(fn, *args):
+    """Run fn(*args) on the worker's persist threads, off the response path"""
+    global _persist_executor, _persist_executor_pid
+    with _persist_executor_lock:
+        # Executor threads do not survive fork(), so each worker process gets its own
+        if _persist_executor is None or _persist_executor_pid != os.getpid():
+            _persist_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='markitdown-persist')
+            _persist_executor_pid = os.getpid()
+    return _persist_executor.submit(fn, *args)
+
 # Initialize custom MarkItDown converter
 try:
-    md_converter = MarkItDown(enable_plugins=False)
+    md_converter = MarkItDown(enable_plugins=False,
+                              fragment_cache=result_store if FRAGMENT_CACHE_ENABLED else None,
+                              background=submit_background)
     logger.info("Custom MarkItDown converter initialized successfully")
 except Exception as e:
     logger.error(f"Error initializing MarkItDown converter: {str(e)}")
@@ -600,61 +3063,343 @@ except Exception as e:
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def cleanup_old_files():
-    """Clean up temporary files older than 1 hour"""
+_ocr_latency = {}
+_ocr_latency_lock = threading.Lock()
+
+def record_ocr_latency(mode, seconds):
+    """Record the latency of one image OCR for the given mode (per worker process)"""
+    with _ocr_latency_lock:
+        stats = _ocr_latency.setdefault(mode, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+        stats['count'] += 1
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+    logger.info(f"OCR ({mode}) took {seconds:.2f}s")
+
+def ocr_latency_stats():
+    with _ocr_latency_lock:
+        return {
+            mode: {
+                'count': stats['count'],
+                'avg_seconds': round(stats['total_seconds'] / stats['count'], 3),
+                'max_seconds': round(stats['max_seconds'], 3)
+            }
+            for mode, stats in _ocr_latency.items()
+        }
+
+def requested_ocr_mode():
+    """OCR mode from the 'ocr_mode' form field, or None if it is not a known mode"""
+    ocr_mode = request.form.get('ocr_mode', '').strip().lower() or OCR_DEFAULT_MODE
+    return ocr_mode if ocr_mode in OCR_MODES else None
+
+def requested_conversion_options():
+    """ConversionOptions from the pages, sheets, slides, max_output_bytes and preview
+    form fields; raises ValueError for malformed values"""
+    sheets = [name for value in request.form.getlist('sheets') for name in value.split(',')]
     try:
-        current_time = time.time()
-        for dir_name in os.listdir(TEMP_DIR):
-            dir_path = os.path.join(TEMP_DIR, dir_name)
-            if os.path.isdir(dir_path):
-                if os.path.getmtime(dir_path) < current_time - 3600:  # 1 hour
-                    try:
-                        shutil.rmtree(dir_path)
-                        logger.info(f"Cleaned up directory {dir_path}")
-                    except Exception as e:
-                        logger.error(f"Error cleaning up directory {dir_path}: {str(e)}")
-    except Exception as e:
-        logger.error(f"Error during cleanup: {str(e)}")
+        max_output_bytes = int(request.form.get('max_output_bytes') or 0) or None
+    except ValueError:
+        raise ValueError("max_output_bytes must be a number of bytes")
+    return ConversionOptions(
+        pages=request.form.get('pages', '').strip() or None,
+        sheets=sheets,
+        slides=request.form.get('slides', '').strip() or None,
+        max_output_bytes=max_output_bytes,
+        preview=request.form.get('preview', '').strip().lower() in ('1', 'true', 'yes', 'on'),
+    )
+
+def _dir_size(path):
+    """Total size in bytes of all files below path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def read_janitor_stats():
+    """Return the stats written by the last janitor sweep (shared across workers)"""
+    try:
+        with open(JANITOR_STATS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-def process_zip_file(zip_path, session_dir):
-    """Process a ZIP file and convert all supported files within it"""
+def _write_janitor_stats(stats):
+    tmp_path = f"{JANITOR_STATS_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, JANITOR_STATS_FILE)
+
+def cleanup_old_files():
+    """Purge expired and least-recently-used results from the store (keeping it under
+    TEMP_DIR_QUOTA_BYTES), then remove working directories left behind in TEMP_DIR"""
+    started = time.time()
+    purged = result_store.purge(TEMP_DIR_QUOTA_BYTES, JANITOR_MIN_EVICT_AGE_SECONDS)
+    purged_fragments = result_store.purge_fragments(FRAGMENT_CACHE_MAX_AGE_SECONDS, FRAGMENT_CACHE_QUOTA_BYTES)
+    
+    # Working directories are removed by their request; only crashed requests leave them behind
+    scratch_removed = 0
+    scratch_bytes = 0
+    expiry_cutoff = started - TEMP_MAX_AGE_SECONDS
+    with os.scandir(TEMP_DIR) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                if entry.stat().st_mtime >= expiry_cutoff:
+                    continue
+                size = _dir_size(entry.path)
+                shutil.rmtree(entry.path)
+                scratch_removed += 1
+                scratch_bytes += size
+                logger.info(f"Cleaned up directory {entry.path}")
+            except Exception as e:
+                logger.error(f"Error cleaning up directory {entry.path}: {str(e)}")
+    
+    reclaimed_bytes = purged['bytes_reclaimed'] + scratch_bytes
+    previous = read_janitor_stats()
+    stats = {
+        'last_sweep_at': started,
+        'last_sweep_seconds': round(time.time() - started, 4),
+        'last_results_expired': purged['results_expired'],
+        'last_results_evicted': purged['results_evicted'],
+        'last_scratch_dirs_removed': scratch_removed,
+        'last_fragments_removed': purged_fragments['fragments_removed'],
+        'fragment_bytes_in_use': purged_fragments['fragment_bytes_in_use'],
+        'last_bytes_reclaimed': reclaimed_bytes,
+        'bytes_in_use': purged['bytes_in_use'],
+        'quota_bytes': TEMP_DIR_QUOTA_BYTES,
+        'total_sweeps': previous.get('total_sweeps', 0) + 1,
+        'total_bytes_reclaimed': previous.get('total_bytes_reclaimed', 0) + reclaimed_bytes,
+        'total_sweep_seconds': round(previous.get('total_sweep_seconds', 0) + time.time() - started, 4),
+        'swept_by_pid': os.getpid()
+    }
+    _write_janitor_stats(stats)
+    removed = purged['results_expired'] + purged['results_evicted'] + scratch_removed
+    if removed:
+        logger.info(f"Janitor sweep removed {removed} entries, reclaimed {reclaimed_bytes} bytes in {stats['last_sweep_seconds']}s")
+    return stats
+
+def _janitor_loop():
+    """Sweep TEMP_DIR in the background; a file lock makes one worker sweep per interval"""
+    import fcntl
+    while True:
+        time.sleep(JANITOR_INTERVAL_SECONDS)
+        try:
+            with open(JANITOR_LOCK_FILE, 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # another worker is sweeping right now
+                try:
+                    last_sweep_at = read_janitor_stats().get('last_sweep_at', 0)
+                    if time.time() - last_sweep_at >= JANITOR_INTERVAL_SECONDS:
+                        cleanup_old_files()
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        except Exception as e:
+            logger.error(f"Error during cleanup: {str(e)}")
+
+_janitor_thread = None
+
+def start_janitor():
+    """Start the background janitor thread for this process (idempotent)"""
+    global _janitor_thread
+    if not JANITOR_ENABLED:
+        return
+    if _janitor_thread is not None and _janitor_thread.is_alive():
+        return
+    _janitor_thread = threading.Thread(target=_janitor_loop, name='markitdown-janitor', daemon=True)
+    _janitor_thread.start()
+
+start_janitor()
+# Threads do not survive fork(), so pre-forking servers (gunicorn) restart it in each worker
+os.register_at_fork(after_in_child=start_janitor)
+
+def spooled_file():
+    """Temporary binary file kept in memory until it grows past UPLOAD_SPOOL_MAX_BYTES"""
+    return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_BYTES, mode='w+b', dir=TEMP_DIR)
+
+def stream_size(stream):
+    """Size in bytes of a seekable binary stream"""
+    position = stream.tell()
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(position)
+    return size
+
+def cost_class(filename, size):
+    """Cost class of converting one file: OCR images, archives and large files are
+    heavy, plain-text formats light, office documents and PDFs standard"""
+    extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    if extension in OCR_EXTENSIONS or extension == 'zip' or size >= ADMISSION_HEAVY_BYTES:
+        return 'heavy'
+    if extension in LIGHT_EXTENSIONS:
+        return 'light'
+    return 'standard'
+
+def request_cost_class():
+    """Cost class of a conversion request: that of its most expensive upload"""
+    if (request.content_length or 0) >= ADMISSION_HEAVY_BYTES:
+        return 'heavy'  # Known from the headers alone
+    if request.form.get('url', '').strip():
+        return 'standard'
+    classes = {cost_class(file.filename or '', stream_size(file.stream))
+               for name in request.files for file in request.files.getlist(name)}
+    for name in ('heavy', 'standard'):
+        if name in classes:
+            return name
+    return 'light'
+
+def admission_controlled(api=False):
+    """Decorator running POST conversions through admission control. A saturated cost
+    class is answered at once with 503 and Retry-After (JSON for API routes)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'POST':
+                return view(*args, **kwargs)
+            request_class = request_cost_class()
+            try:
+                with admission.admit(request_class):
+                    return view(*args, **kwargs)
+            except AdmissionRejected as e:
+                logger.warning(f"Shedding {request_class} conversion: {str(e)}")
+                headers = {'Retry-After': str(e.retry_after)}
+                if api:
+                    return {'error': str(e)}, 503, headers
+                flash(f'{str(e)}.', 'error')
+                return render_template('index.html',
+                                       allowed_extensions=sorted(ALLOWED_EXTENSIONS),
+                                       max_file_size_mb=MAX_FILE_SIZE // (1024*1024)), 503, headers
+        return wrapper
+    return decorator
+
+def process_zip_file(zip_source, ocr_mode=None, options=None):
+    """Convert all supported files within a ZIP archive without extracting it to disk"""
     results = {}
     
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        file_list = [f for f in zip_ref.namelist() if not f.endswith('/')]
-        zip_ref.extractall(session_dir)
-        
-        for file_path in file_list:
+    with zipfile.ZipFile(zip_source, 'r') as zip_ref:
+        for member in zip_ref.infolist():
+            file_path = member.filename
             try:
-                extracted_file_path = os.path.join(session_dir, file_path)
-                
-                if os.path.isdir(extracted_file_path) or os.path.basename(extracted_file_path).startswith('.'):
+                member_name = os.path.basename(file_path)
+                if member.is_dir() or member_name.startswith('.'):
                     continue
                 
-                if not allowed_file(os.path.basename(file_path)):
+                if not allowed_file(member_name):
                     logger.warning(f"Skipping unsupported file: {file_path}")
                     continue
                 
-                # Convert the file
-                conversion_result = md_converter.convert(extracted_file_path)
+                # Convert the file from a spooled copy of the member
+                with spooled_file() as member_file:
+                    with zip_ref.open(member) as member_stream:
+                        shutil.copyfileobj(member_stream, member_file)
+                    conversion_result = md_converter.convert(member_file, filename=member_name, ocr_mode=ocr_mode, options=options)
                 markdown_content = conversion_result.text_content
-                output_filename = os.path.splitext(os.path.basename(file_path))[0] + '.md'
-                
-                # Save the result
-                output_path = os.path.join(session_dir, output_filename)
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(markdown_content)
+                output_filename = os.path.splitext(member_name)[0] + '.md'
                 
                 results[output_filename] = markdown_content
                 logger.info(f"Successfully converted {file_path} to {output_filename}")
                 
+            except AdmissionRejected:
+                raise
             except Exception as e:
                 logger.error(f"Error processing file {file_path}: {str(e)}")
                 results[os.path.basename(file_path)] = f"Error: {str(e)}"
     
     return results
 
+def url_output_filename(url):
+    """Generate a markdown filename from a URL"""
+    parsed_url = urlparse(url)
+    url_path = parsed_url.path
+    if url_path and url_path != '/':
+        base_name = os.path.basename(url_path)
+        if not base_name:
+            base_name = "url_content"
+    else:
+        base_name = parsed_url.netloc.replace('.', '_') or "url_content"
+    return f"{base_name}.md"
+
+def persist_result(conversion_id, filename, data, mimetype='text/markdown'):
+    """Save a result to the result store in the background, off the response path.
+    Returns False when persistence is disabled."""
+    if not PERSIST_RESULTS:
+        return False
+    if isinstance(data, mmap.mmap):
+        # The response closes its mmap when sent, possibly while the store is still reading it
+        data = bytes(data)
+    future = submit_background(result_store.put, conversion_id, filename, data, mimetype)
+    future.add_done_callback(_log_persist_failure)
+    return True
+
+def accepted_encodings(size, mimetype):
+    """Content-Encodings the client accepts for a response of size bytes, best first
+    (by Accept-Encoding quality, then server preference); empty to send it as is"""
+    if not RESPONSE_COMPRESSION or size < COMPRESSION_MIN_BYTES or mimetype in COMPRESSED_MIMETYPES:
+        return []
+    preference = available_encodings()
+    qualities = {encoding: request.accept_encodings.quality(encoding) for encoding in preference}
+    return sorted((encoding for encoding in preference if qualities[encoding] > 0),
+                  key=lambda encoding: -qualities[encoding])
+
+def send_download(stream, filename, mimetype, size=None, encoding=None):
+    """send_file() for a result download; encoding marks an already compressed stream,
+    which is always sent whole (byte ranges of one encoding do not resume another)"""
+    response = send_file(stream, mimetype=mimetype, as_attachment=True, download_name=filename,
+                         conditional=not encoding)
+    # Range requests on in-memory streams get a 206 with the length of the part
+    if size is not None and response.status_code == 200:
+        response.content_length = size
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+def send_compressed(stream, filename, mimetype, size):
+    """Send a stream compressed on the fly in the best accepted encoding, if any.
+    The compressed length is not known up front, so the response is chunked."""
+    encodings = accepted_encodings(size, mimetype)
+    if not encodings:
+        return send_download(stream, filename, mimetype, size=size)
+    encoding = encodings[0]
+    return send_download(CompressingReader(stream, encoding, STREAM_COMPRESSION_LEVELS[encoding]),
+                         filename, mimetype, encoding=encoding)
+
+def send_result(data, filename, conversion_id, mimetype='text/markdown'):
+    """Send a freshly converted result from memory and persist it in the background;
+    X-Conversion-Id addresses the stored copy in /download/<id>/<filename>"""
+    if isinstance(data, mmap.mmap):
+        # Passthrough of a text file on disk: sent from the mapping without a copy
+        data.seek(0)
+        stream = data
+    else:
+        stream = io.BytesIO(data)
+    response = send_compressed(stream, filename, mimetype, len(data))
+    if persist_result(conversion_id, filename, data, mimetype):
+        response.headers['X-Conversion-Id'] = conversion_id
+    return response
+
+def send_stored_result(conversion_id, filename):
+    """Send a result from the result store, or return None if it is missing or expired.
+    A stored precompressed variant is sent as it is when the client accepts it."""
+    row = result_store.get(conversion_id, filename)
+    if row is None:
+        return None
+    variant = result_store.open_variant(row, accepted_encodings(row['size'], row['mimetype']))
+    if variant is not None:
+        encoding, stream, size = variant
+        return send_download(stream, row['filename'], row['mimetype'], size=size, encoding=encoding)
+    try:
+        stream = result_store.open(row)
+    except FileNotFoundError:
+        return None
+    return send_compressed(stream, row['filename'], row['mimetype'], row['size'])
+
 @app.route('/', methods=['GET', 'POST'])
+@admission_controlled()
 def index():
     if request.method == 'POST':
         try:
@@ -666,41 +3411,18 @@ def index():
                 try:
                     # Use MarkItDown's convert_uri method for URLs
                     conversion_result = md_converter.convert_uri(url)
-                    result_markdown = conversion_result.text_content
+                    result_bytes = conversion_result.text_content.encode('utf-8')
                     
-                    # Create session for URL result
-                    session_id = str(uuid.uuid4())
-                    session_dir = os.path.join(TEMP_DIR, session_id)
-                    os.makedirs(session_dir, exist_ok=True)
-                    
-                    # Generate filename from URL
-                    parsed_url = urlparse(url)
-                    url_path = parsed_url.path
-                    if url_path and url_path != '/':
-                        base_name = os.path.basename(url_path)
-                        if not base_name:
-                            base_name = "url_content"
-                    else:
-                        base_name = parsed_url.netloc.replace('.', '_') or "url_content"
-                    
-                    output_filename = f"{base_name}.md"
-                    output_path = os.path.join(session_dir, output_filename)
-                    
-                    with open(output_path, 'w', encoding='utf-8') as f:
-                        f.write(result_markdown)
+                    conversion_id = str(uuid.uuid4())
+                    output_filename = url_output_filename(url)
                     
                     # Store in session
-                    session['conversion_id'] = session_id
+                    session['conversion_id'] = conversion_id
                     session['single_file'] = output_filename
                     session.permanent = True
                     
                     # Return single file download
-                    return send_file(
-                        io.BytesIO(result_markdown.encode('utf-8')),
-                        mimetype='text/markdown',
-                        as_attachment=True,
-                        download_name=output_filename
-                    )
+                    return send_result(result_bytes, output_filename, conversion_id)
                     
                 except Exception as e:
                     logger.error(f"Error converting URL {url}: {str(e)}")
@@ -714,53 +3436,55 @@ def index():
                     flash('No files selected', 'error')
                     return redirect(request.url)
                 
+                ocr_mode = requested_ocr_mode()
+                if ocr_mode is None:
+                    flash(f'Unknown OCR mode. Choose one of: {", ".join(OCR_MODES)}', 'error')
+                    return redirect(request.url)
+                try:
+                    options = requested_conversion_options()
+                except ValueError as e:
+                    flash(str(e), 'error')
+                    return redirect(request.url)
+                
                 converted_files = []
-                session_id = str(uuid.uuid4())
-                session_dir = os.path.join(TEMP_DIR, session_id)
-                os.makedirs(session_dir, exist_ok=True)
+                conversion_id = str(uuid.uuid4())
                 
                 for file in files:
                     if file and file.filename != '':
                         if not allowed_file(file.filename):
                             flash(f'File type not supported: {file.filename}', 'error')
                             continue
+                        if file.stream.rejection:
+                            flash(file.stream.rejection, 'error')
+                            continue
                         
                         filename = secure_filename(file.filename)
-                        file_path = os.path.join(session_dir, filename)
-                        file.save(file_path)
                         
                         try:
                             # Special handling for ZIP files
                             if filename.lower().endswith('.zip'):
-                                zip_results = process_zip_file(file_path, session_dir)
+                                zip_results = process_zip_file(file.stream, ocr_mode, options)
                                 for zip_filename, content in zip_results.items():
                                     converted_files.append({
                                         'original': filename,
                                         'converted': zip_filename,
-                                        'path': os.path.join(session_dir, zip_filename)
+                                        'content': content.encode('utf-8')
                                     })
-                                # Remove the ZIP file after processing
-                                os.remove(file_path)
                             else:
-                                # Regular file conversion
-                                conversion_result = md_converter.convert(file_path)
-                                result_markdown = conversion_result.text_content
-                                
-                                # Save markdown file
+                                # Regular file conversion, straight from the spooled upload
+                                conversion_result = md_converter.convert(file.stream, filename=filename, ocr_mode=ocr_mode, options=options)
                                 output_filename = os.path.splitext(filename)[0] + '.md'
-                                output_path = os.path.join(session_dir, output_filename)
-                                
-                                with open(output_path, 'w', encoding='utf-8') as f:
-                                    f.write(result_markdown)
                                 
                                 converted_files.append({
                                     'original': filename,
                                     'converted': output_filename,
-                                    'path': output_path
+                                    'content': conversion_result.encoded()
                                 })
                                 
                                 logger.info(f"Successfully converted {filename} to {output_filename}")
                         
+                        except AdmissionRejected:
+                            raise
                         except Exception as e:
                             logger.error(f"Error converting {filename}: {str(e)}")
                             flash(f'Error converting {filename}: {str(e)}', 'error')
@@ -770,37 +3494,29 @@ def index():
                     return redirect(request.url)
                 
                 # Store conversion results in session
-                session['conversion_id'] = session_id
+                session['conversion_id'] = conversion_id
                 session['converted_files'] = [f['converted'] for f in converted_files]
                 session.permanent = True
                 
                 # If only one file, return it directly
                 if len(converted_files) == 1:
                     session['single_file'] = converted_files[0]['converted']
-                    with open(converted_files[0]['path'], 'r', encoding='utf-8') as f:
-                        markdown_content = f.read()
-                    
-                    return send_file(
-                        io.BytesIO(markdown_content.encode('utf-8')),
-                        mimetype='text/markdown',
-                        as_attachment=True,
-                        download_name=converted_files[0]['converted']
-                    )
+                    return send_result(converted_files[0]['content'], converted_files[0]['converted'], conversion_id)
                 
                 # Multiple files - create ZIP
-                zip_path = os.path.join(session_dir, 'converted_files.zip')
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                for file_info in converted_files:
+                    persist_result(conversion_id, file_info['converted'], file_info['content'])
+                zip_buffer = io.BytesIO()
+                with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
                     for file_info in converted_files:
-                        zipf.write(file_info['path'], file_info['converted'])
+                        zipf.writestr(file_info['converted'], file_info['content'])
+                zip_bytes = zip_buffer.getvalue()
                 
                 session['zip_file'] = 'converted_files.zip'
-                return send_file(
-                    zip_path,
-                    mimetype='application/zip',
-                    as_attachment=True,
-                    download_name='converted_files.zip'
-                )
+                return send_result(zip_bytes, 'converted_files.zip', conversion_id, mimetype='application/zip')
         
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error in file processing: {str(e)}")
             flash(f'An unexpected error occurred: {str(e)}', 'error')
@@ -824,9 +3540,15 @@ def health_check():
                 'file_conversion': True,
                 'url_conversion': True,
                 'zip_processing': True,
-                'session_management': True
+                'session_management': True,
+                'result_store': True,
+                'response_compression': list(available_encodings()) if RESPONSE_COMPRESSION else []
             },
-            'supported_formats': len(ALLOWED_EXTENSIONS)
+            'supported_formats': len(ALLOWED_EXTENSIONS),
+            'ocr_default_mode': OCR_DEFAULT_MODE,
+            'ocr_latency': ocr_latency_stats(),
+            'admission': admission.stats(),
+            'janitor': read_janitor_stats()
         }
         return status, 200
     except Exception as e:
@@ -839,28 +3561,25 @@ def download_file(filename):
         flash('Session expired. Please convert files again.', 'error')
         return redirect(url_for('index'))
     
-    session_dir = os.path.join(TEMP_DIR, session['conversion_id'])
-    file_path = os.path.join(session_dir, filename)
-    
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
+    response = send_stored_result(session['conversion_id'], filename)
+    if response is not None:
+        return response
     else:
         flash('File not found or session expired', 'error')
         return redirect(url_for('index'))
 
 @app.errorhandler(413)
 def too_large(e):
-    flash(f'File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB', 'error')
+    message = f'File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB'
+    if e.description != RequestEntityTooLarge.description:
+        message = e.description  # Per-type limit hit while the upload was streamed
+    if request.endpoint == 'convert_async':
+        return {'error': message}, 413
+    flash(message, 'error')
     return redirect(request.url)
 
-@app.before_request
-def periodic_cleanup():
-    """Run cleanup periodically"""
-    import random
-    if random.randint(1, 20) == 1:  # 5% chance
-        cleanup_old_files()
-
 @app.route('/convert_async', methods=['POST'])
+@admission_controlled(api=True)
 def convert_async():
     """API endpoint for async conversion"""
     try:
@@ -879,36 +3598,14 @@ def convert_async():
                     logger.error(f"URL conversion failed for {url}: {result_markdown}")
                     return {'error': result_markdown}, 400
                 
-                # Create session for URL result
-                session_id = str(uuid.uuid4())
-                session_dir = os.path.join(TEMP_DIR, session_id)
-                os.makedirs(session_dir, exist_ok=True)
-                
-                # Generate filename from URL
-                parsed_url = urlparse(url)
-                url_path = parsed_url.path
-                if url_path and url_path != '/':
-                    base_name = os.path.basename(url_path)
-                    if not base_name:
-                        base_name = "url_content"
-                else:
-                    base_name = parsed_url.netloc.replace('.', '_') or "url_content"
-                
-                output_filename = f"{base_name}.md"
-                output_path = os.path.join(session_dir, output_filename)
-                
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(result_markdown)
+                conversion_id = str(uuid.uuid4())
+                output_filename = url_output_filename(url)
+                result_bytes = result_markdown.encode('utf-8')
                 
                 logger.info(f"URL conversion successful for {url}: {len(result_markdown)} characters extracted")
                 
                 # Return the file directly as a download
-                return send_file(
-                    io.BytesIO(result_markdown.encode('utf-8')),
-                    mimetype='text/markdown',
-                    as_attachment=True,
-                    download_name=output_filename
-                )
+                return send_result(result_bytes, output_filename, conversion_id)
                 
             except Exception as e:
                 logger.error(f"Error converting URL {url}: {str(e)}")
@@ -931,56 +3628,54 @@ def convert_async():
         
         if not allowed_file(file.filename):
             return {'error': 'File type not supported'}, 400
+        if file.stream.rejection:
+            return {'error': file.stream.rejection}, 415
         
-        # Process file
-        session_id = str(uuid.uuid4())
-        session_dir = os.path.join(TEMP_DIR, session_id)
-        os.makedirs(session_dir, exist_ok=True)
+        ocr_mode = requested_ocr_mode()
+        if ocr_mode is None:
+            return {'error': f'Unknown OCR mode. Choose one of: {", ".join(OCR_MODES)}'}, 400
+        try:
+            options = requested_conversion_options()
+        except ValueError as e:
+            return {'error': str(e)}, 400
         
+        # Process file straight from the spooled upload
+        conversion_id = str(uuid.uuid4())
         filename = secure_filename(file.filename)
-        file_path = os.path.join(session_dir, filename)
-        file.save(file_path)
         
         # Convert
-        logger.info(f"Starting conversion of {filename} ({os.path.getsize(file_path)} bytes)")
-        conversion_result = md_converter.convert(file_path)
-        result_markdown = conversion_result.text_content
+        logger.info(f"Starting conversion of {filename} ({stream_size(file.stream)} bytes, sha256 {file.stream.content_hash})")
+        conversion_result = md_converter.convert(file.stream, filename=filename, ocr_mode=ocr_mode, options=options)
         
-        # Check if conversion was successful
-        if result_markdown.startswith("Error") or result_markdown.startswith("Warning: No text could be extracted"):
-            logger.error(f"Conversion failed for {filename}: {result_markdown}")
-            return {'error': result_markdown}, 400
+        # Check if conversion was successful (passthrough text is the file itself, never an error)
+        if conversion_result.data is None:
+            result_markdown = conversion_result.text_content
+            if result_markdown.startswith("Error") or result_markdown.startswith("Warning: No text could be extracted"):
+                logger.error(f"Conversion failed for {filename}: {result_markdown}")
+                return {'error': result_markdown}, 400
+        result_bytes = conversion_result.encoded()
         
         # Log successful conversion details
-        logger.info(f"Conversion successful for {filename}: {len(result_markdown)} characters extracted")
+        logger.info(f"Conversion successful for {filename}: {len(result_bytes)} bytes of markdown")
         
         # Save result and return file directly
         output_filename = os.path.splitext(filename)[0] + '.md'
-        output_path = os.path.join(session_dir, output_filename)
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(result_markdown)
         
         # Return the file directly as a download
-        return send_file(
-            io.BytesIO(result_markdown.encode('utf-8')),
-            mimetype='text/markdown',
-            as_attachment=True,
-            download_name=output_filename
-        )
+        return send_result(result_bytes, output_filename, conversion_id)
     
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error in async conversion: {str(e)}")
         return {'error': str(e)}, 500
 
 @app.route('/download/<session_id>/<filename>')
 def download_session_file(session_id, filename):
-    """Download file from specific session"""
-    session_dir = os.path.join(TEMP_DIR, session_id)
-    file_path = os.path.join(session_dir, filename)
-    
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
+    """Download file from specific conversion"""
+    response = send_stored_result(session_id, filename)
+    if response is not None:
+        return response
     else:
         return {'error': 'File not found'}, 404
 
@@ -992,7 +3687,221 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
+def write_atomic(path, data):
+    """Write data to path via a temporary file in the same directory and a rename,
+    so readers never see a partial output"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+
+def bulk_sources(paths, files_from=None):
+    """Yield (source path, output path relative to the output directory, before the
+    .md suffix) for every supported file under the given files and directories.
+    Output paths keep the source's extension (report.pdf -> report.pdf.md), so files
+    that differ only in extension never share an output."""
+    roots = list(paths)
+    if files_from:
+        with (sys.stdin if files_from == '-' else open(files_from, encoding='utf-8')) as listing:
+            roots.extend(line.rstrip('\n') for line in listing if line.strip())
+    
+    for root in roots:
+        root = os.path.abspath(root)
+        if not os.path.isdir(root):
+            if allowed_file(root):
+                # Listed files keep their own directory structure below the output directory
+                yield root, root.lstrip(os.sep)
+            continue
+        # Several roots are kept apart by their names
+        base = os.path.dirname(root) if len(roots) > 1 else root
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(name for name in dirnames if not name.startswith('.'))
+            for name in sorted(filenames):
+                if name.startswith('.') or not allowed_file(name):
+                    continue
+                path = os.path.join(directory, name)
+                yield path, os.path.relpath(path, base)
+
+def bulk_convert_file(path, output_stem, known_hash, ocr_mode):
+    """Convert one file for a bulk run (runs in a pool process).
+    
+    The file is read once, into a spooled copy that is hashed on the way; if the
+    hash matches the manifest the conversion is skipped. ZIP archives produce a
+    directory of outputs named after the archive.
+    """
+    stat = os.stat(path)
+    name = os.path.basename(path)
+    is_zip = name.lower().endswith('.zip')
+    result = {'size': stat.st_size, 'mtime': stat.st_mtime, 'error': None,
+              'output': output_stem if is_zip else output_stem + '.md'}
+    content_hash = hashlib.sha256()
+    with spooled_file() as spooled, open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), b''):
+            content_hash.update(chunk)
+            spooled.write(chunk)
+        result['sha256'] = content_hash.hexdigest()
+        if result['sha256'] == known_hash and os.path.exists(result['output']):
+            result['status'] = 'unchanged'
+            return result
+        
+        if is_zip:
+            for member_output, markdown in process_zip_file(spooled, ocr_mode).items():
+                write_atomic(os.path.join(output_stem, member_output), markdown.encode('utf-8'))
+            result['status'] = 'done'
+            return result
+        
+        conversion = md_converter.convert(spooled, filename=name, ocr_mode=ocr_mode)
+        text = conversion.text_content if conversion.data is None else ''
+        if text.startswith('Error') or text.startswith('Warning: No text could be extracted'):
+            result['status'] = 'error'
+            result['error'] = conversion.text_content
+            result['output'] = None  # Nothing was written
+            return result
+        write_atomic(result['output'], conversion.encoded())
+    result['status'] = 'done'
+    return result
+
+def _bulk_worker_init():
+    # Pool processes keep their OCR models between files and stay out of the
+    # server's fragment cache, which a backfill would only flood
+    md_converter.keep_ocr_models = True
+    md_converter.fragment_cache = None
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def run_bulk(argv):
+    """Convert a directory tree or file list offline with a process pool and a resumable manifest"""
+    import argparse
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    global JANITOR_ENABLED
+    
+    parser = argparse.ArgumentParser(prog='app.py --bulk', description='Convert files to markdown without the web server.')
+    parser.add_argument('paths', nargs='*', help='files and directories to convert')
+    parser.add_argument('--files-from', help='file with one path per line ("-" for stdin)')
+    parser.add_argument('--output', required=True, help='directory for the markdown outputs')
+    parser.add_argument('--manifest', help='manifest database (default: OUTPUT/.markitdown-manifest.db)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='conversion processes')
+    parser.add_argument('--ocr-mode', choices=OCR_MODES, default=OCR_DEFAULT_MODE)
+    parser.add_argument('--force', action='store_true', help='reconvert files the manifest marks as unchanged')
+    args = parser.parse_args(argv)
+    if not args.paths and not args.files_from:
+        parser.error('give at least one path or --files-from')
+    
+    output_dir = os.path.abspath(args.output)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = BulkManifest(args.manifest or os.path.join(output_dir, '.markitdown-manifest.db'))
+    entries = manifest.entries()
+    
+    # Plan: files whose size and mtime match a completed manifest entry are skipped
+    # without being read; the rest are converted, biggest first for a steadier ETA
+    jobs = []
+    planned_outputs = {}
+    total = skipped = 0
+    for path, output_stem in bulk_sources(args.paths, args.files_from):
+        total += 1
+        # Only same-named roots (e.g. a/docs and b/docs) can map two files to one output
+        owner = planned_outputs.setdefault(output_stem, path)
+        if owner != path:
+            error = f"Output {output_stem}.md is already used by {owner}"
+            logger.error(f"Bulk conversion skipped {path}: {error}")
+            manifest.record(path, None, None, None, 'error', error=error)
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            manifest.record(path, None, None, None, 'error', error=str(e))
+            continue
+        entry = entries.get(path)
+        if entry and not args.force and entry[3] == 'done' and entry[0] == stat.st_size and entry[1] == stat.st_mtime:
+            skipped += 1
+            continue
+        known_hash = entry[2] if entry and entry[3] == 'done' and not args.force else None
+        jobs.append((stat.st_size, path, os.path.join(output_dir, output_stem), known_hash))
+    jobs.sort(reverse=True)
+    total_bytes = sum(job[0] for job in jobs)
+    print(f"📋 {total} files: {skipped} unchanged, {len(jobs)} to convert ({total_bytes / (1024*1024):.1f}MB) "
+          f"with {args.workers} workers", flush=True)
+    
+    JANITOR_ENABLED = False  # Not needed in the pool processes
+    counts = {'done': 0, 'unchanged': 0, 'error': 0}
+    done_bytes = 0
+    started = last_report = time.time()
+    
+    def report(final=False):
+        elapsed = max(time.time() - started, 1e-6)
+        finished = sum(counts.values())
+        rate = done_bytes / elapsed
+        eta = (total_bytes - done_bytes) / rate if rate else 0
+        print(f"{'✅' if final else '⏳'} {finished}/{len(jobs)} files "
+              f"({counts['done']} converted, {counts['unchanged']} unchanged, {counts['error']} failed) | "
+              f"{finished / elapsed:.1f} files/s, {rate / (1024*1024):.2f}MB/s | "
+              f"{'elapsed ' + _format_duration(elapsed) if final else 'ETA ' + _format_duration(eta)}", flush=True)
+    
+    pending = {}
+    queued = iter(jobs)
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_bulk_worker_init) as executor:
+            while True:
+                # Keep a bounded number of jobs in flight
+                for size, path, output_stem, known_hash in queued:
+                    future = executor.submit(bulk_convert_file, path, output_stem, known_hash, args.ocr_mode)
+                    pending[future] = (size, path)
+                    if len(pending) >= args.workers * 4:
+                        break
+                if not pending:
+                    break
+                completed, _ = wait(pending, timeout=2, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    size, path = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'size': size, 'mtime': None, 'sha256': None, 'status': 'error', 'output': None, 'error': str(e)}
+                    # Unchanged content is recorded as done so the next run skips it on size/mtime
+                    status = 'done' if result['status'] == 'unchanged' else result['status']
+                    manifest.record(path, result['size'], result['mtime'], result['sha256'], status,
+                                    result['output'], result['error'])
+                    counts[result['status']] += 1
+                    done_bytes += size
+                    if result['status'] == 'error':
+                        logger.error(f"Bulk conversion failed for {path}: {result['error']}")
+                if time.time() - last_report >= 2:
+                    report()
+                    last_report = time.time()
+    finally:
+        manifest.close()
+    report(final=True)
+    return 1 if counts['error'] else 0
+
+def run_ocr_service():
+    """Run the shared OCR sidecar in the foreground"""
+    socket_path = OCR_SERVICE_SOCKET or os.path.join(UPLOAD_FOLDER, 'markitdown-ocr.sock')
+    print("=" * 60)
+    print("🔎 MarkItDown OCR Service")
+    print("=" * 60)
+    print(f"🔌 Socket: {socket_path}")
+    print(f"📥 Queue size: {OCR_SERVICE_QUEUE_SIZE}")
+    print(f"📦 Batch size: {OCR_SERVICE_BATCH_SIZE}")
+    print("   Set OCR_SERVICE_SOCKET to this path for the web workers")
+    print("=" * 60)
+    OCRService(socket_path, OCR_SERVICE_QUEUE_SIZE, OCR_SERVICE_BATCH_SIZE, OCR_SERVICE_BATCH_WAIT).serve_forever()
+
 if __name__ == '__main__':
+    if '--ocr-service' in sys.argv[1:]:
+        run_ocr_service()
+        sys.exit(0)
+    if sys.argv[1:2] == ['--bulk']:
+        sys.exit(run_bulk(sys.argv[2:]))
+    
     # Get port from environment variable or default to 8008
     port = int(os.environ.get('PORT', 8008))
     
@@ -1001,6 +3910,7 @@ if __name__ == '__main__':
     print("=" * 60)
     print(f"📁 Upload folder: {UPLOAD_FOLDER}")
     print(f"📁 Temp folder: {TEMP_DIR}")
+    print(f"📁 Result store: {RESULT_STORE_DIR}")
     print(f"📊 Max file size: {MAX_FILE_SIZE // (1024*1024)}MB")
     print(f"📋 Supported formats: {len(ALLOWED_EXTENSIONS)} types")
     print(f"   {', '.join(sorted(ALLOWED_EXTENSIONS))}")
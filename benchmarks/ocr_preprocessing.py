@@ -0,0 +1,140 @@
+"""OCR preprocessing benchmark: time and accuracy with and without _prepare_ocr_frames.
+
+Renders synthetic pages with known text (large photo-like pages, small text,
+a narrow receipt, light-on-dark text), OCRs each one with the original image
+and with the preprocessed frames, and prints time and character accuracy.
+
+    python benchmarks/ocr_preprocessing.py [--mode balanced] [--font /path/to/font.ttf] [--rapidocr]
+
+Needs EasyOCR and its models (EASYOCR_MODULE_PATH), like the app itself. With
+--rapidocr, RapidOCR (pip install rapidocr-onnxruntime, models included) stands
+in for EasyOCR, with its detector sized like EasyOCR's (longest side capped at
+2560, never enlarged), for machines where the EasyOCR models are not available.
+
+Results with EasyOCR, balanced mode, 1 CPU core:
+
+    case                                       original       preprocessed
+    scan 2480x3508 (A4 300dpi)             64.7s  98.4%       51.0s  98.4%
+    photo 6000x4000, large text            45.1s  97.6%       50.9s  95.2%
+    photo 6000x4000, small text            52.1s  99.5%       52.2s  99.3%
+    receipt 300x20000                       5.0s   0.1%      188.4s  98.4%
+    poster 10000x14000, small text         89.4s  19.0%      214.4s  96.8%
+    dark 3000x2000                         45.2s  96.9%       44.1s  96.9%
+
+The receipt and the poster take longer because their text is actually read:
+shrunk whole into the detector, it is too small to find. Both stay within the
+OCR_MAX_TILES budget (14 and 12 tiles of 20); images that would need more are
+downscaled further, so the time per image is bounded.
+"""
+import argparse
+import difflib
+import io
+import os
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+
+class RapidOCRReader:
+    """easyocr.Reader stand-in backed by RapidOCR"""
+
+    def __init__(self, *args, **kwargs):
+        import numpy as np
+        from rapidocr_onnxruntime import RapidOCR
+        self.np = np
+        self.engine = RapidOCR(max_side_len=app.OCR_DETECTION_CANVAS, det_limit_side_len=app.OCR_DETECTION_CANVAS,
+                               det_limit_type='max')
+
+    def readtext(self, image, **params):
+        if isinstance(image, self.np.ndarray) and image.ndim == 2:
+            image = self.np.stack([image] * 3, axis=-1)
+        result, _ = self.engine(image)
+        return [(box, text, float(confidence)) for box, text, confidence in (result or [])]
+
+
+LINES = [
+    'Invoice 20931 issued on 14 March 2024',
+    'Total amount due 1,284.50 EUR',
+    'The quick brown fox jumps over the lazy dog',
+    'Payment within 30 days of the invoice date',
+    'Reference number QX-4471-B9 must be quoted',
+]
+
+# name, width, height, font size (px), light text on a dark background
+CASES = [
+    ('scan 2480x3508 (A4 300dpi)', 2480, 3508, 42, False),
+    ('photo 6000x4000, large text', 6000, 4000, 110, False),
+    ('photo 6000x4000, small text', 6000, 4000, 36, False),
+    ('receipt 300x20000', 300, 20000, 14, False),
+    ('poster 10000x14000, small text', 10000, 14000, 42, False),
+    ('dark 3000x2000', 3000, 2000, 60, True),
+]
+
+
+def render(width, height, size, inverted, font_path):
+    font = ImageFont.truetype(font_path, size)
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    text = []
+    y = size
+    while y + size < height:
+        line = LINES[len(text) % len(LINES)]
+        # Receipts wrap long lines to their width
+        while font.getlength(line) > width - 2 * size and ' ' in line:
+            line = line.rsplit(' ', 1)[0]
+        draw.text((size, y), line, font=font, fill=0)
+        text.append(line)
+        y += int(size * 1.8)
+    if inverted:
+        image = Image.eval(image, lambda value: 255 - value)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    buffer.name = 'page.png'
+    return buffer.getvalue(), ' '.join(text)
+
+
+def accuracy(expected, actual):
+    return difflib.SequenceMatcher(None, ' '.join(expected.split()), ' '.join(actual.split())).ratio()
+
+
+def run(converter, data, mode, preprocess):
+    original = converter._prepare_ocr_frames
+    if not preprocess:
+        converter._prepare_ocr_frames = lambda source: [[(converter._read_bytes(source), 0, 0)]]
+    try:
+        started = time.time()
+        text = converter._convert_image_local(io.BytesIO(data), mode).text_content
+        return time.time() - started, text
+    finally:
+        converter._prepare_ocr_frames = original
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', default='balanced', choices=app.OCR_MODES)
+    parser.add_argument('--font', default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+    parser.add_argument('--rapidocr', action='store_true', help='use RapidOCR in place of EasyOCR')
+    args = parser.parse_args()
+    if args.rapidocr:
+        if args.mode == 'fast':
+            parser.error('--rapidocr has no separate detection step for the fast mode')
+        sys.modules['easyocr'] = type(sys)('easyocr')
+        sys.modules['easyocr'].Reader = RapidOCRReader
+
+    converter = app.MarkItDown(keep_ocr_models=True)
+    print(f"{'case':32} {'original':>18} {'preprocessed':>18}")
+    for name, width, height, size, inverted in CASES:
+        data, expected = render(width, height, size, inverted, args.font)
+        cells = []
+        for preprocess in (False, True):
+            seconds, text = run(converter, data, args.mode, preprocess)
+            cells.append(f"{seconds:7.1f}s {accuracy(expected, text):6.1%}")
+        print(f"{name:32} {cells[0]:>18} {cells[1]:>18}")
+
+
+if __name__ == '__main__':
+    main()
@@ -114,7 +114,6 @@ SERVICE_FILE="/etc/systemd/system/${SERVICE_NAME}"
 LOG_DIR="${PROJECT_DIR}/logs"
 MODELS_DIR="${PROJECT_DIR}/models"
 EASYOCR_DIR="${MODELS_DIR}/easyocr"
-SESSIONS_DIR="${PROJECT_DIR}/sessions"
 TMP_DIR="${PROJECT_DIR}/tmp"
 BACKUP_DIR="${PROJECT_DIR}/backups"
 
@@ -220,7 +219,7 @@ create_directories() {
     mkdir -p "$PROJECT_DIR"
     
     # Create subdirectories
-    local dirs=("$LOG_DIR" "$MODELS_DIR" "$EASYOCR_DIR" "$SESSIONS_DIR" "$TMP_DIR" "$BACKUP_DIR")
+    local dirs=("$LOG_DIR" "$MODELS_DIR" "$EASYOCR_DIR" "$TMP_DIR" "$BACKUP_DIR")
     for dir in "${dirs[@]}"; do
         log_info "Creating directory: $dir"
         mkdir -p "$dir"
@@ -236,7 +235,7 @@ create_directories() {
     chmod -R 755 "$PROJECT_DIR"
     
     # Set special permissions for writable directories
-    chmod 777 "$EASYOCR_DIR" "$SESSIONS_DIR" "$TMP_DIR" "$LOG_DIR"
+    chmod 777 "$EASYOCR_DIR" "$TMP_DIR" "$LOG_DIR"
     
     log_success "Directory structure created successfully"
 }
@@ -327,7 +326,6 @@ Environment="HOME=$PROJECT_DIR"
 Environment="OPENCV_IO_ENABLE_OPENEXR=0"
 Environment="DISPLAY="
 Environment="EASYOCR_MODULE_PATH=$EASYOCR_DIR"
-Environment="SESSION_FILE_DIR=$SESSIONS_DIR"
 Environment="TMPDIR=$TMP_DIR"
 ExecStart=$PROJECT_DIR/venv/bin/python app.py
 Restart=always
@@ -479,7 +477,6 @@ IS_SYNOLOGY="$IS_SYNOLOGY"
 LOG_DIR="$LOG_DIR"
 MODELS_DIR="$MODELS_DIR"
 EASYOCR_DIR="$EASYOCR_DIR"
-SESSIONS_DIR="$SESSIONS_DIR"
 TMP_DIR="$TMP_DIR"
 BACKUP_DIR="$BACKUP_DIR"
 VENV_DIR="$VENV_DIR"
@@ -554,7 +551,7 @@ tail -f $LOG_DIR/markitdown.log
 cd $PROJECT_DIR
 sudo chown -R $WEB_USER:$WEB_GROUP .
 sudo chmod -R 755 .
-sudo chmod 777 models/easyocr sessions tmp logs
+sudo chmod 777 models/easyocr tmp logs
 \`\`\`
 
 #### Service Issues
@@ -578,7 +575,6 @@ python -c "import easyocr; print('EasyOCR available')"
 ### Environment Variables
 The application uses these key environment variables:
 - \`EASYOCR_MODULE_PATH\`: $EASYOCR_DIR
-- \`SESSION_FILE_DIR\`: $SESSIONS_DIR
 - \`TMPDIR\`: $TMP_DIR
 - \`OPENCV_IO_ENABLE_OPENEXR\`: 0
 - \`DISPLAY\`: "" (headless mode)
@@ -593,7 +589,6 @@ $PROJECT_DIR/
 ├── venv/                      # Python virtual environment
 ├── logs/                      # Application logs
 ├── models/                    # EasyOCR models
-├── sessions/                  # Session storage
 ├── tmp/                       # Temporary files
 ├── deployment.env             # Deployment configuration
 ├── DEPLOYMENT.md              # This documentation